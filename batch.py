@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# batch.py
+
+import argparse
+import model as m
+
+class ConsoleProgress(m.Progress):
+	""" Prints the progression of the computation on the standard output. """
+	
+	def Update(self, count, total, name=""):
+		print("[%d/%d] %s" % (count, total, name))
+
+
+class Batch():
+	""" This class computes a study without user interface (and without wx).
+	
+	The study (reference, scenarios and parameters) is read from a study file
+	(see model.load_study) and the results are written in a JSON file and,
+	if archive is given, with the study in a study archive (see model.save_study).
+	If a cache directory is given, the scenarios which have not changed since
+	a previous run are not computed again (see model.ResultCache).
+	"""
+	
+	def __init__(self, study, results, processes=1, quiet=False, starts=1, seed=None, profile=False, cache=None, archive=None):
+		model = m.Model()
+		model.processes = processes
+		model.starts = starts
+		model.seed = seed
+		model.profile = profile
+		if cache != None:
+			model.cache = m.ResultCache(path=cache)
+		m.load_study(study, model)
+		
+		if quiet:
+			progress = m.Progress()
+		else:
+			progress = ConsoleProgress()
+		model.Calculate(progress)
+		m.save_results(model, results)
+		if archive != None:
+			m.save_study(model, archive)
+		
+		if profile and not quiet:
+			for r, stats in zip(model.optimizations_results, model.optimizations_profiles):
+				print_profile(r.name, stats)
+
+
+def stream(study, scenarios, results, processes=1, quiet=False, starts=1, seed=None):
+	""" Computes the scenarios of a scenario file with the parameters and the
+	reference of a study file, and appends their results to results as soon as
+	they are computed (see model.ScenarioStream). A run which has been
+	interrupted continues after the last result written.
+	"""
+	model = m.Model()
+	m.load_study(study, model)
+	scenario_stream = m.ScenarioStream(model.param, model.reference, processes, starts, seed)
+	
+	def callback(row):
+		if not quiet:
+			print("[%d] %s %s" % (row["index"], row.get("name", ""), row.get("error", "")))
+	count = scenario_stream.Run(scenarios, results, callback=callback)
+	if not quiet:
+		print("%d scenarios computed" % count)
+
+def print_profile(name, stats):
+	""" Prints the statistics of an optimization (see model.Profiler.Stats). """
+	print("%s : %.3f s, %d iterations" % (name, stats["time"], len(stats["history"])))
+	for counter in sorted(stats["counters"]):
+		c = stats["counters"][counter]
+		print("  %-16s %8d calls %10.3f s %10.3f ms/call" % (counter, c["calls"], c["time"], 1000 * c["per_call"]))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Computes the simulation and optimization scenarios of a study file.")
+	parser.add_argument("study", help="study file (JSON or study archive)")
+	parser.add_argument("results", help="results file (JSON, one line per scenario with --scenarios)")
+	parser.add_argument("-p", "--processes", type=int, default=1, help="number of worker processes")
+	parser.add_argument("-s", "--starts", type=int, default=1, help="number of starting points of each optimization")
+	parser.add_argument("--seed", type=int, default=None, help="seed of the random starting points")
+	parser.add_argument("--profile", action="store_true", help="count and time the evaluations of the optimizations (written in the results)")
+	parser.add_argument("--cache", default=None, help="directory where the results of the scenarios are kept to be reused by the next runs")
+	parser.add_argument("--archive", default=None, help="study archive where the study and its results are saved")
+	parser.add_argument("--scenarios", default=None, help="scenario file (one JSON scenario per line) computed as a stream with the parameters and the reference of the study")
+	parser.add_argument("-q", "--quiet", action="store_true", help="do not print the progression")
+	args = parser.parse_args()
+	if args.scenarios != None:
+		stream(args.study, args.scenarios, args.results, args.processes, args.quiet, args.starts, args.seed)
+	else:
+		Batch(args.study, args.results, args.processes, args.quiet, args.starts, args.seed, args.profile, args.cache, args.archive)
@@ -0,0 +1,276 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bench_model.py
+
+""" Micro-benchmarks and scaling suite for the hot paths of the model.
+
+Synthetic corridors are built with an increasing number of zones, lines and
+optimized variables, and each aggregate is timed. Results are written as JSON
+so that two runs (e.g. two commits) can be compared :
+
+	python benchmarks/bench_model.py -o before.json
+	python benchmarks/bench_model.py -o after.json --compare before.json
+
+The aggregates and the optimizations are timed through the public API of the
+first version of the model (Corridor, OD, Model.Calculate), so that this file
+can be copied into an older checkout to measure it. The cases of the API
+added since then are skipped when it is not available.
+
+The suite does not need wx (except for the versions of the model which
+import it).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+
+# (zones, lines) of the synthetic corridors
+SIZES = [(1, 2), (3, 4), (5, 4), (10, 6), (20, 6), (50, 8)]
+# Number of optimized lines of the full optimization benchmark
+OPTIMIZED = [1, 2, 4]
+
+
+def synthetic_corridor(zones, nb_lines, param, seed=0, length=30.0):
+	""" Returns a corridor of the given length with zones of random lengths,
+	random demand and nb_lines lines (car, then transit modes).
+	
+	Corridors of 1 to 3 zones have the zones of the typologies (homogenous,
+	city center and interurban), which every version of the model optimizes.
+	"""
+	random.seed(seed)
+	weights = [random.uniform(0.5, 1.5) for i in range(zones)]
+	if zones <= 3:
+		c = m.Corridor("Benchmark", length, zones - 1)
+	else:
+		c = m.Corridor("Benchmark", length, 0)
+		set_zones(c, [length * w / sum(weights) for w in weights])
+	for od in c.demand:
+		od.demand = random.choice([0, 50, 200, 800])
+	
+	modes = [0, 1, 2, 3, 4, 5]
+	for i in range(nb_lines):
+		line = param.DefaultLine(c, modes[i % len(modes)])
+		line.price = 1.5 if line.m != 0 else 0
+		line.name = "%s %d" % (line.name, i)
+		c.lines.append(line)
+	return c
+
+def set_zones(corridor, zone_length):
+	""" Defines the zones of the corridor by their lengths (see
+	Corridor.SetZones, the attributes of the corridor are set directly if it
+	does not exist).
+	"""
+	if hasattr(corridor, "SetZones"):
+		corridor.SetZones(zone_length)
+		return
+	corridor.zone_length = zone_length
+	corridor.landmarks = [0]
+	for l in zone_length:
+		corridor.landmarks.append(corridor.landmarks[-1] + l)
+	corridor.n = len(zone_length)
+	corridor.ResetDemand()
+
+def measure(function, repeat, number=None):
+	""" Returns the best and mean time (in seconds) of one call of function. """
+	if number == None:
+		# Calibrating the number of calls so that a measure lasts about 0.05 s
+		number = 1
+		while True:
+			t = time.time()
+			for i in range(number):
+				function()
+			if time.time() - t > 0.05 or number >= 1000:
+				break
+			number *= 2
+	times = []
+	for r in range(repeat):
+		t = time.time()
+		for i in range(number):
+			function()
+		times.append((time.time() - t) / number)
+	return min(times), sum(times) / len(times)
+
+def uncached(function, *corridors):
+	""" Returns a function which empties the cache of the corridors (see
+	Corridor.Cached) and calls function, so that the aggregates are computed
+	at each call and not only looked up.
+	"""
+	def call():
+		for corridor in corridors:
+			if hasattr(corridor, "cache"):
+				corridor.cache.clear()
+		return function()
+	return call
+
+def aggregates_benchmarks(param, repeat):
+	""" Times the aggregates of the corridor for each size of SIZES (computed
+	at each call, and looked up in the cache of the corridor for "(cached)"
+	cases).
+	"""
+	results = []
+	for zones, nb_lines in SIZES:
+		corridor = synthetic_corridor(zones, nb_lines, param)
+		reference = synthetic_corridor(zones, 2, param)
+		line = corridor.lines[-1]
+		cases = [("Demand", uncached(lambda: corridor.Demand(param, line), corridor)),
+				("TotalCost", uncached(lambda: corridor.TotalCost(param), corridor)),
+				("TotalSurplus", uncached(lambda: reference.TotalSurplus(param, corridor), corridor, reference)),
+				("GetElasticDemand", uncached(lambda: reference.GetElasticDemand(param, corridor), reference)),
+				("MaxLoadA", uncached(lambda: corridor.MaxLoadA(), corridor)),
+				("InVehicleTime", lambda: [od.InVehicleTime(line) for od in corridor.demand])]
+		if hasattr(corridor, "cache"):
+			cases.append(("TotalCost (cached)", lambda: corridor.TotalCost(param)))
+		for name, function in cases:
+			best, mean = measure(function, repeat)
+			results.append({"name": name, "zones": zones, "lines": nb_lines, 
+							"variables": 0, "best": best, "mean": mean})
+	return results
+
+def logit_benchmarks(param, repeat):
+	""" Times the vectorized logit model and the equilibrium with crowding
+	for each size of SIZES (the cases which are not available are skipped).
+	"""
+	results = []
+	if hasattr(m, "Equilibrium"):
+		crowded = param.Duplicate()
+		crowded.crowding = [0] + [1]*(crowded.nb_modes - 1)
+	for zones, nb_lines in SIZES:
+		corridor = synthetic_corridor(zones, nb_lines, param)
+		reference = synthetic_corridor(zones, 2, param)
+		cases = []
+		if hasattr(m, "Logit"):
+			cases += [("ElasticDemand", uncached(lambda: reference.ElasticDemand(param, corridor), reference)),
+					("Logit", lambda: m.Logit(corridor, param))]
+		if hasattr(m, "Equilibrium"):
+			cases.append(("Equilibrium", uncached(lambda: m.Equilibrium(crowded, corridor, reference).Solve(), 
+												reference)))
+		for name, function in cases:
+			best, mean = measure(function, repeat)
+			results.append({"name": name, "zones": zones, "lines": nb_lines, 
+							"variables": 0, "best": best, "mean": mean})
+	return results
+
+def batch_benchmarks(param, repeat, batch=1000):
+	""" Times the objective function of an optimization (two optimized lines)
+	for one decision vector, called once per vector and for a batch of
+	vectors (time per vector).
+	"""
+	results = []
+	for zones, nb_lines in SIZES[:5]:
+		for elasticity in (False, True):
+			reference = synthetic_corridor(zones, 2, param)
+			corridor = synthetic_corridor(zones, nb_lines, param)
+			lines = corridor.lines[-2:]
+			corridor.lines = corridor.lines[:-2]
+			for line in lines:
+				line.opt = [1, [1]*zones]
+			objective = m.Objective(param, reference, corridor, lines, elasticity)
+			X = np.array(objective.StartingPoints(batch, 0))
+			suffix = " (elastic)" if elasticity else ""
+			cases = [("ValueAndGradient" + suffix, lambda: [objective.ValueAndGradient(x) for x in X[:10]], 10),
+					("ValuesAndGradients" + suffix, lambda: objective.ValuesAndGradients(X), batch)]
+			for name, function, size in cases:
+				best, mean = measure(function, repeat)
+				results.append({"name": name, "zones": zones, "lines": nb_lines, 
+								"variables": len(X[0]), "best": best/size, "mean": mean/size})
+	return results
+
+def optimize_benchmarks(param, repeat, elasticity=False):
+	""" Times a full optimization (Model.Optimize) for several numbers of
+	optimized lines (frequency and stop spacing in each zone).
+	"""
+	results = []
+	for zones, nb_lines in SIZES[:4]:
+		# Corridor.Duplicate kept only the zones of the typologies before
+		# Corridor.SetZones
+		if zones > 3 and not hasattr(m.Corridor, "SetZones"):
+			continue
+		for nb_opt in OPTIMIZED:
+			def run():
+				model = m.Model()
+				model.param = param
+				model.reference = synthetic_corridor(zones, 2, param)
+				corridor = synthetic_corridor(zones, nb_lines, param)
+				lines = corridor.lines[-nb_opt:]
+				corridor.lines = corridor.lines[:-nb_opt]
+				for line in lines:
+					line.opt = [1, [1]*zones]
+				model.optimizations.append([corridor, lines, elasticity])
+				model.Calculate()
+			best, mean = measure(run, repeat, 1)
+			results.append({"name": "Optimize" + (" (elastic)" if elasticity else ""),
+							"zones": zones, "lines": nb_lines, 
+							"variables": nb_opt*(zones + 1), "best": best, "mean": mean})
+	return results
+
+def git_revision():
+	""" Returns the current git commit (or None). """
+	try:
+		return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+			cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+	except Exception:
+		return None
+
+def compare(results, path):
+	""" Prints the ratio between the best times of results and of the results
+	saved in the given file.
+	"""
+	f = open(path)
+	try:
+		old = json.load(f)
+	finally:
+		f.close()
+	
+	old_times = {}
+	for r in old["results"]:
+		old_times[(r["name"], r["zones"], r["lines"], r["variables"])] = r["best"]
+	print("%-28s %5s %5s %5s %12s %12s %8s" % ("benchmark", "zones", "lines", "vars", "before (ms)", "after (ms)", "speedup"))
+	for r in results:
+		key = (r["name"], r["zones"], r["lines"], r["variables"])
+		if key in old_times:
+			print("%-28s %5d %5d %5d %12.3f %12.3f %8.2f" % (key + (1000*old_times[key], 1000*r["best"], old_times[key]/r["best"])))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Benchmarks of the model hot paths.")
+	parser.add_argument("-o", "--output", help="results file (JSON)")
+	parser.add_argument("-r", "--repeat", type=int, default=3, help="number of measures of each benchmark")
+	parser.add_argument("-c", "--compare", help="results file of a previous run to compare with")
+	parser.add_argument("--quick", action="store_true", help="skip the optimization benchmarks")
+	args = parser.parse_args()
+	
+	param = m.Parameters()
+	results = aggregates_benchmarks(param, args.repeat)
+	results += logit_benchmarks(param, args.repeat)
+	if hasattr(m, "BatchObjective"):
+		results += batch_benchmarks(param, args.repeat)
+	if not args.quick:
+		results += optimize_benchmarks(param, args.repeat)
+		results += optimize_benchmarks(param, args.repeat, True)
+	
+	if args.output:
+		f = open(args.output, "w")
+		try:
+			json.dump({"revision": git_revision(), 
+						"python": platform.python_version(),
+						"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+						"results": results}, f, indent=1)
+		finally:
+			f.close()
+	
+	if args.compare:
+		compare(results, args.compare)
+	else:
+		for r in results:
+			print("%-28s %5d %5d %5d %10.3f ms" % (r["name"], r["zones"], r["lines"], r["variables"], 1000*r["best"]))
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# BatchObjective.py
+
+import numpy as np
+
+from Logit import *
+from LoadProfile import *
+
+class BatchObjective():
+	""" Evaluates the objective function of an optimization scenario and its
+	gradient for many decision vectors at once (see Objective.ValuesAndGradients).
+
+	The OD attributes, the lines which are not optimized and the load profiles
+	of one traveler of each OD do not depend on the decision vector : they are
+	taken once from the evaluation scenario of the objective, and the time
+	components, splits, loads and costs of all the decision vectors are
+	computed as arrays with one more axis (batch x OD x lines) instead of
+	writing each vector into the lines of the scenario (see Objective.Bind).
+
+	Attributes :
+		- objective -- Objective evaluated
+		- chunk -- Maximum number of elements (batch x OD x lines) of the
+			arrays computed at once
+		- logit -- Logit model of the evaluation scenario (OD attributes and
+			lines)
+		- elastic_logit -- Logit model of the lines of the scenario for the OD
+			of the reference (if demand is elastic)
+		- f, s -- Frequency (lines) and stop spacing (lines x zones) of the
+			variables which are not optimized
+	"""
+
+	def __init__(self, objective, chunk=1000000):
+		self.objective = objective
+		self.chunk = chunk
+		param = objective.param
+		corridor = objective.scenario
+		lines = corridor.lines
+		self.corridor = corridor
+
+		self.logit = Logit(corridor, param)
+		if objective.elasticity:
+			reference = objective.reference
+			self.elastic_logit = Logit(reference, param, lines)
+			self.demand0 = reference.od.Flat("demand")
+			self.costs0 = reference.ReferenceCosts(param)
+
+		n = corridor.n
+		self.zone_length = np.array(corridor.zone_length, dtype=float)
+		self.f = np.array([line.f for line in lines], dtype=float)
+		self.s = np.array([line.s[:n] for line in lines], dtype=float).reshape(len(lines), n)
+		self.k = np.array([line.k for line in lines], dtype=float)
+		self.dt = np.array([line.dt for line in lines], dtype=float)
+		# Running time without stops and inverse of the maximum speed in each
+		# zone, computed as in Line.GetCommercialSpeed
+		zone_length = corridor.zone_length
+		self.free_time = np.array([[zone_length[i]/line.v[i] for i in range(n)] for line in lines], 
+									dtype=float).reshape(len(lines), n)
+		self.inverse_v = np.array([[1/line.v[i] for i in range(n)] for line in lines], 
+									dtype=float).reshape(len(lines), n)
+
+		# Costs of the operators for each line
+		mode = self.logit.mode
+		self.cexp = np.array([param.cexp[m] for m in mode], dtype=float)
+		self.cinf = np.array([param.cinf[m] for m in mode], dtype=float)
+		self.csta = np.array([param.csta[m] for m in mode], dtype=float)
+
+		self.unit_loads = corridor.UnitLoads()
+
+	def Evaluate(self, X, gradient=True):
+		""" Returns the values of the objective function for the decision
+		vectors of the rows of X (batch x variables) and their gradients
+		(batch x variables, None if gradient is False).
+		"""
+		X = np.asarray(X, dtype=float)
+		if X.ndim == 1:
+			X = X[None, :]
+		cells = max(1, len(self.logit.demand) * len(self.f))
+		size = max(1, self.chunk // cells)
+		values = []
+		gradients = []
+		for start in range(0, len(X), size):
+			v, g = self.EvaluateChunk(X[start:start + size], gradient)
+			values.append(v)
+			gradients.append(g)
+		if not values:
+			values, gradients = [np.zeros(0)], [np.zeros((0, X.shape[1]))]
+		values = np.concatenate(values)
+		if not gradient:
+			return values, None
+		return values, np.concatenate(gradients)
+
+	def Supply(self, X):
+		""" Returns the frequency (batch x lines), the stop spacing (batch x
+		lines x zones), the running time in each zone and the table of
+		running times (batch x lines x (zones+1)) of the decision vectors X
+		(see Line.TimeTable).
+		"""
+		nb = len(X)
+		f = np.tile(self.f, (nb, 1))
+		s = np.tile(self.s, (nb, 1, 1))
+		for c, (i, j) in enumerate(self.objective.variables):
+			if j < 0:
+				f[:, i] = X[:, c]
+			else:
+				s[:, i, j] = X[:, c]
+
+		zl = self.zone_length
+		with np.errstate(divide="ignore", invalid="ignore"):
+			stop = self.logit.transit[None, :, None] & (s <= zl[None, None, :])
+			zone_time = np.where(stop, zl * (self.inverse_v + self.dt[None, :, None] / s), self.free_time)
+		table = np.zeros(zone_time.shape[:2] + (zone_time.shape[2] + 1,))
+		table[:, :, 1:] = np.cumsum(zone_time, axis=2)
+		return f, s, zone_time, table
+
+	def Costs(self, logit, f, s, zone_time, table):
+		""" Returns the utility of each line for each OD (batch x OD x lines)
+		with the OD attributes and the lines of logit (see Logit).
+		"""
+		param = self.objective.param
+		origin = logit.origin
+		dest = logit.dest
+		transit = logit.transit[None, None, :]
+		with np.errstate(divide="ignore", invalid="ignore"):
+			access = np.where(transit, logit.fd[None, :, None] * s[:, :, origin].transpose(0, 2, 1) /
+								(2 * logit.va[None, :, None]), 0.0)
+			egress = np.where(transit, logit.fe[None, :, None] * s[:, :, dest].transpose(0, 2, 1) /
+								(2 * logit.ve[None, :, None]), 0.0)
+			waiting = np.where(transit, logit.fw[None, :, None] / f[:, None, :], 0.0)
+
+			a = np.minimum(origin, dest)
+			b = np.maximum(origin, dest)
+			intra = (a == b)[None, :, None]
+			ends = 0.5 * (zone_time[:, :, a] + zone_time[:, :, b]).transpose(0, 2, 1)
+			between = (table[:, :, b] - table[:, :, np.minimum(a + 1, b)]).transpose(0, 2, 1)
+			invehicle = np.where(intra, 0.25 * zone_time[:, :, a].transpose(0, 2, 1), ends + between)
+
+			wtt = param.wa * access + param.ww * waiting + param.wt * invehicle + param.we * egress
+			alpha = np.array([param.alpha[m] for m in logit.mode], dtype=float)
+			cost = param.ctime * wtt + logit.price[None, None, :] + alpha[None, None, :]
+			cost += np.where(~logit.transit, param.car_price * logit.trip_length[:, None], 0.0)[None, :, :]
+		return cost
+
+	def EvaluateChunk(self, X, gradient):
+		""" Returns the values and the gradients of the decision vectors X (see Evaluate). """
+		objective = self.objective
+		param = objective.param
+		logit = self.logit
+		nb = len(X)
+		f, s, zone_time, table = self.Supply(X)
+
+		# Demand and logit model of the scenario
+		cost = self.Costs(logit, f, s, zone_time, table)
+		if objective.elasticity:
+			d0 = self.demand0
+			gc0 = np.where(d0 == 0, 0.0, self.costs0)
+			gc_e = np.where(d0 == 0, 0.0, log_sum_exp(self.Costs(self.elastic_logit, f, s, zone_time, table))[1])
+			demand = elastic_demand(d0[None, :], gc0[None, :], gc_e, param.captive, param.gamma)
+		else:
+			demand = np.tile(logit.demand, (nb, 1))
+		split, logsum = log_sum_exp(cost, demand)
+		gc = np.where(demand == 0, 0.0, logsum)
+		flows = demand[:, :, None] * split
+		line_demand = flows.sum(axis=1)
+
+		# Costs of the travelers and of the operators (see Line.OperatorCost)
+		with np.errstate(invalid="ignore"):
+			generalized_cost = np.where(demand == 0, 0.0, demand * gc).sum(axis=1)
+		price = np.where(logit.transit, logit.price, 0.0)
+		revenues = (line_demand * price[None, :]).sum(axis=1)
+		t = table[:, :, -1]
+		vehicles = np.where(logit.transit, 2.0 * f * t, 0.0)
+		zl = self.zone_length
+		with np.errstate(divide="ignore", invalid="ignore"):
+			stations = np.where(s < zl[None, None, :], self.csta[None, :, None] * zl / s, 0.0).sum(axis=2)
+		infra = np.where(logit.transit, self.cinf * vehicles + stations, self.cinf)
+		operator_cost = (self.cexp * vehicles + infra).sum(axis=1)
+
+		# Malus of the lines whose maximum load is over their capacity (see
+		# Logit.LinePeaks)
+		nb_lines = len(self.f)
+		peaks = []
+		abscisses = []
+		for u in self.unit_loads:
+			coef = np.tensordot(flows.transpose(0, 2, 1), u, axes=1)
+			p, x = batched_peaks(self.corridor.landmarks, np.reshape(coef, (-1,) + u.shape[1:]))
+			peaks.append(np.reshape(p, (nb, nb_lines)))
+			abscisses.append(np.reshape(x, (nb, nb_lines)))
+		direction = np.argmax(peaks, axis=0)
+		peak = np.where(direction == 0, peaks[0], peaks[1])
+		excess = np.maximum(peak - f * self.k[None, :], 0)
+		malus = (excess**2).sum(axis=1)
+
+		if objective.elasticity:
+			# Consumer surplus (see Corridor.GetConsumerSurplus)
+			gc0 = np.where(demand == 0, 0.0, self.costs0[None, :])
+			infinite = np.isinf(gc) | np.isinf(gc0)
+			first = np.argmax(infinite, axis=1)
+			surplus = np.where(infinite, 0.0, demand * 0.5 * (gc0 - gc)).sum(axis=1)
+			surplus = np.where(infinite.any(axis=1),
+								np.where(np.isinf(gc[np.arange(nb), first]), -float("inf"), float("inf")),
+								surplus)
+			values = -(surplus + revenues - operator_cost) + malus
+		else:
+			values = generalized_cost + operator_cost - revenues + malus
+		if not gradient:
+			return values, None
+
+		# Same derivatives as Objective.ValueAndGradient, for each row
+		with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+			pbar = (split * price).sum(axis=2)
+			x = np.where(direction == 0, abscisses[0], abscisses[1]).ravel()
+			loads = [unit_loads(u, self.corridor.landmarks, x).T.reshape(nb, nb_lines, -1) for u in self.unit_loads]
+			unit = np.where((direction == 0)[:, :, None], loads[0], loads[1]).transpose(0, 2, 1)
+			e = 2 * excess[:, None, :] * unit
+			ebar = (split * e).sum(axis=2)
+
+			if objective.elasticity:
+				gc0 = np.where(d0 == 0, 0.0, self.costs0)[None, :]
+				valid = (d0 != 0)[None, :] & np.isfinite(gc0) & np.isfinite(gc) & (gc != 0)
+				ratio = np.where(valid, gc0 / np.where(valid, gc, 1), 0.0)
+				kappa = np.where(valid, -d0 * (1 - param.captive) * param.gamma * ratio**param.gamma / np.where(valid, gc, 1), 0.0)
+				d_demand = -0.5 * np.where(valid, gc0 - gc, 0.0) - pbar + ebar
+				base = d_demand * kappa + 0.5 * demand
+			else:
+				base = demand
+
+			w = split * (base[:, :, None] + demand[:, :, None] * (price[None, None, :] - pbar[:, :, None] + ebar[:, :, None] - e))
+			w = np.where(np.isfinite(w), w, 0.0)
+
+			grad = np.zeros((nb, len(objective.variables)))
+			for c, (i, j) in enumerate(objective.variables):
+				transit = logit.transit[i]
+				cost_rate = self.cexp[i] + self.cinf[i]
+				if j < 0:
+					if transit:
+						dv = -param.ctime * param.ww * logit.fw[None, :] / f[:, i, None]**2
+						grad[:, c] = (w[:, :, i] * dv).sum(axis=1)
+						grad[:, c] += cost_rate * 2.0 * t[:, i]
+					grad[:, c] -= 2 * excess[:, i] * self.k[i]
+				elif transit:
+					# Derivative of the running time in the zone (see Line.ZoneTimeDerivative)
+					d_time = np.where(s[:, i, j] <= zl[j], -zl[j] * self.dt[i] / s[:, i, j]**2, 0.0)
+					dv = param.wa * logit.fd / (2 * logit.va) * (logit.origin == j) + \
+						param.we * logit.fe / (2 * logit.ve) * (logit.dest == j)
+					dv = dv[None, :] + param.wt * logit.zone_share[None, :, j] * d_time[:, None]
+					grad[:, c] = (w[:, :, i] * param.ctime * dv).sum(axis=1)
+					grad[:, c] += cost_rate * 2.0 * f[:, i] * d_time
+					grad[:, c] -= np.where(s[:, i, j] < zl[j], self.csta[i] * zl[j] / s[:, i, j]**2, 0.0)
+		return values, grad
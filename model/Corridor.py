@@ -3,28 +3,44 @@
 
 # Corridor.py
 
+import numpy as np
+
 from OD import *
+from Logit import *
+from LoadProfile import *
+from Equilibrium import *
 
-class Corridor():
+class Corridor(object):
 	""" Contains the characteristics of the corridor.
 	
 		Attributes :
 			- name -- Name of the corridor/scenario
 			- length -- Length in km
-			- demand -- A list of OD instances
+			- od -- ODMatrix which stores the demand and the attributes of all OD
+			- demand -- A list of OD instances (views over od, in origin-major order).
+				Assigning a list of OD copies their attributes into od.
 			- lines -- A list of Line instances
 			- typo -- An integer describing the typology (0 for homogenous,
-				1 for city center and 2 for interurban). To add some typology models,
-				modify the method SetTypology.
+				1 for city center and 2 for interurban, Corridor.CUSTOM for zones
+				given by SetZones). To add some typology models, modify the method
+				SetTypology.
 			- n -- Number of zones
-			- zone_length -- Length of each zone in km
+			- zone_length -- Length of each zone in km (the list is replaced when the
+				zones change, it is never modified in place, see Line.TimeTable)
 			- landmarks -- Abscisses of zones' limits
+			- cache -- Results derived from the corridor (logit model, load profiles,
+				reference costs) : {name : (key, result)}, see Cached
 	"""
+	# Typology of a corridor whose zones are given by SetZones
+	CUSTOM = 3
+	
 	def __init__(self, name, length, typo):
 		self.name = str(name)
 		self.length = float(length)
-		self.demand = []
+		self.od = None
+		self.od_views = []
 		self.lines = []
+		self.cache = {}
 		
 		self.typo = typo
 		self.n = 1
@@ -39,11 +55,14 @@ class Corridor():
 		
 		Has to be used to modify the length.
 		"""
+		if self.typo == Corridor.CUSTOM:
+			# Zones keep their share of the length
+			self.SetZones([z*float(l)/self.length for z in self.zone_length])
+			return
 		self.length = l
 		self.SetTypology(self.typo) # Updating zone length and landmarks
 		# Updating od (trip length)
-		for od in self.demand:
-			od.Update()
+		self.od.Update(self)
 		
 	def SetTypology(self, typo):
 		""" Modify the typology of the corridor, reset the OD and update lines.
@@ -54,6 +73,15 @@ class Corridor():
 		self.typo = typo
 		l = self.length
 		
+		# Zones given by SetZones (the current zones are kept, a single zone
+		# for a new corridor)
+		if self.typo == Corridor.CUSTOM:
+			if not self.zone_length:
+				self.zone_length = [l]
+				self.landmarks = [0, l]
+				self.n = 1
+			return
+		
 		# Homogenous
 		if self.typo == 0:
 			self.zone_length = [l]
@@ -90,12 +118,37 @@ class Corridor():
 			self.ResetDemand()
 			self.ResetLines()
 	
+	def SetZones(self, zone_length=None, landmarks=None):
+		""" Defines any number of zones by their lengths (km) or by the abscisses
+		of their limits (landmarks, from 0 to the length of the corridor).
+		
+		The typology becomes Corridor.CUSTOM and the length the sum of the
+		zones. The OD and the lines are reset if the number of zones changes,
+		otherwise the trip lengths are updated.
+		"""
+		if zone_length == None:
+			zone_length = [landmarks[i+1] - landmarks[i] for i in range(len(landmarks) - 1)]
+		zone_length = [float(z) for z in zone_length]
+		if len(zone_length) == 0 or min(zone_length) <= 0:
+			raise ValueError("zones must have a positive length")
+		
+		n = self.n
+		self.typo = Corridor.CUSTOM
+		self.zone_length = zone_length
+		self.landmarks = [0.0]
+		for z in zone_length:
+			self.landmarks.append(self.landmarks[-1] + z)
+		self.length = self.landmarks[-1]
+		self.n = len(zone_length)
+		if self.n != n or self.od == None:
+			self.ResetDemand()
+			self.ResetLines()
+		else:
+			self.od.Update(self)
+	
 	def TotalDemand(self):
 		""" Returns the total level of demand. """
-		r = 0
-		for od in self.demand:
-			r += od.demand
-		return r
+		return float(self.od.demand.sum())
 		
 	def Demand(self, param, line):
 		""" Returns the demand for the specified line according to param.
@@ -106,17 +159,93 @@ class Corridor():
 			print("Programming error : line has to be in Corridor.lines for Corridor.Demand(self, param, line)")
 			return 0
 		
-		r = 0
-		for od in self.demand:
-			r += od.demand * od.ModalSplit(param, self.lines, line)
-		return r
+		logit = self.GetLogit(param)
+		return float(logit.LineDemand()[logit.Index(line)])
+	
+	def GetLogit(self, param, lines=None):
+		""" Returns the vectorized logit model of the demand of the corridor
+		for the given set of lines (self.lines by default).
+		
+		The model of self.lines is cached until the parameters, the geometry,
+		the OD or the lines change. It is shared : it must not be modified.
+		If param takes crowding into account, it is the model at the
+		equilibrium of the lines and the demand (see Equilibrium).
+		"""
+		if lines is not None:
+			return Logit(self, param, lines)
+		if param.Crowded():
+			return self.Cached("logit", self.LogitKey(param), lambda: Equilibrium(param, self).Solve())
+		return self.Cached("logit", self.LogitKey(param), lambda: Logit(self, param))
+	
+	def LogitKey(self, param):
+		""" Returns the key of the logit model of self.lines (see GetLogit). """
+		return (param.Key(), self.GeometryKey(), self.od.revision, self.LinesKey(), 
+				tuple([id(line) for line in self.lines]))
+	
+	def SetEquilibrium(self, param, reference):
+		""" Sets the demand of the corridor to the elastic demand with respect
+		to reference at the equilibrium with crowding (see Equilibrium).
+		
+		Returns the logit model at the equilibrium, which is also cached.
+		"""
+		logit = Equilibrium(param, self, reference).Solve()
+		self.SetDemand(logit.demand)
+		self.cache["logit"] = (self.LogitKey(param), logit)
+		return logit
+	
+	def Cached(self, name, key, compute):
+		""" Returns the result stored in self.cache under the given name if it
+		was computed with the same key, otherwise computes it with the function
+		compute and stores it.
+		
+		The key has to contain everything the result depends on.
+		"""
+		cached = self.cache.get(name)
+		if cached == None or cached[0] != key:
+			cached = (key, compute())
+			self.cache[name] = cached
+		return cached[1]
+	
+	def GeometryKey(self):
+		""" Returns a key which changes when the zones of the corridor change. """
+		return (self.length, tuple(self.zone_length))
+	
+	def LinesKey(self):
+		""" Returns a key which changes when the attributes of self.lines change. """
+		return tuple([line.Key() for line in self.lines])
 	
 	def ResetDemand(self):
 		""" Resets the list of OD. """
-		self.demand = []
+		self.od = ODMatrix(self.n)
+		self.od.Update(self)
+		self.CreateViews()
+	
+	def CreateViews(self):
+		""" Creates the list of OD instances which are views over self.od. """
+		self.od_views = []
 		for i in range(self.n):
 			for j in range(self.n):
-				self.demand.append(OD(self, i, j, 0))
+				self.od_views.append(OD(self, i, j, matrix=self.od))
+	
+	def GetDemand(self):
+		""" Returns the list of OD (views over self.od). """
+		return self.od_views
+	
+	def SetDemand(self, demand):
+		""" Sets the demand of the corridor from a list of OD (their attributes
+		are copied in self.od) or from the level of demand of each OD
+		(in the order of self.demand).
+		"""
+		if len(demand) != 0 and isinstance(demand[0], OD):
+			for od in demand:
+				for name in ODMatrix.ATTRIBUTES[:-1]:
+					getattr(self.od, name)[od.origin, od.dest] = getattr(od, name)
+			self.od.Touch()
+		else:
+			self.od.demand[:, :] = np.reshape(np.asarray(demand, dtype=float), (self.n, self.n))
+			self.od.Touch(False)
+	
+	demand = property(GetDemand, SetDemand)
 	
 	def ResetLines(self):
 		""" Resets the list of lines. """
@@ -124,28 +253,64 @@ class Corridor():
 	
 	def GetOD(self, origin, dest):
 		""" Returns the asked OD object and 0 if not founded. """
-		for od in self.demand:
-			if od.origin == origin and od.dest == dest:
-				return od
+		if origin >= 0 and origin < self.n and dest >= 0 and dest < self.n:
+			return self.od_views[origin*self.n + dest]
 		return 0
 	
+	def __getstate__(self):
+		# OD views are rebuilt from the matrix when unpickled and only the
+		# reference costs (see Model.Calculate) and a logit model at the
+		# equilibrium (with its diagnostics, see SetEquilibrium) are kept
+		# from the cache
+		state = self.__dict__.copy()
+		del state["od_views"]
+		state["cache"] = {}
+		if "reference_costs" in self.cache:
+			state["cache"]["reference_costs"] = self.cache["reference_costs"]
+		if "logit" in self.cache and self.cache["logit"][1].equilibrium != None:
+			state["cache"]["logit"] = self.cache["logit"]
+		return state
+	
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.CreateViews()
+		# The lines are new objects (see LogitKey)
+		if "logit" in self.cache:
+			key, logit = self.cache["logit"]
+			self.cache["logit"] = (key[:-1] + (tuple([id(line) for line in self.lines]),), logit)
+	
 	def AvgTravelTime(self, param):
 		""" Computes the average travel time on all OD with the existing lines. """
-		t = 0.0 # Time
-		q = 0.0 # Normalization factor
-		for od in self.demand:
-			for line in self.lines:
-				p = od.demand * od.ModalSplit(param, self.lines, line) # Number of travelers
-				if p != 0 and od.TravelTime(line) == float("inf"):
-					return float("inf")
-				else:
-					t += p * od.TravelTime(line)
-					q += p
-			
-		if q != 0:
-			return t / q
-		else:
-			return float("inf")
+		return self.GetLogit(param).AvgTravelTime()
+	
+	def LoadProfileA(self, weights=None):
+		""" Returns the exact profile of the sum of all OD LoadA.
+		
+		weights can replace the demand of each OD (in the order of self.demand).
+		The profile of the demand is cached (see GetLogit).
+		"""
+		if weights is not None:
+			return LoadProfile(self, "A", weights)
+		key = (self.GeometryKey(), self.od.revision)
+		return self.Cached("load_a", key, lambda: LoadProfile(self, "A"))
+	
+	def LoadProfileB(self, weights=None):
+		""" Returns the exact profile of the sum of all OD LoadB.
+		
+		weights can replace the demand of each OD (in the order of self.demand).
+		The profile of the demand is cached (see GetLogit).
+		"""
+		if weights is not None:
+			return LoadProfile(self, "B", weights)
+		key = (self.GeometryKey(), self.od.revision)
+		return self.Cached("load_b", key, lambda: LoadProfile(self, "B"))
+	
+	def UnitLoads(self):
+		""" Returns the coefficients of the load of one traveler of each OD in
+		directions A and B (see unit_coefficients), cached until the zones change.
+		"""
+		return self.Cached("unit_loads", self.GeometryKey(), 
+						lambda: [unit_coefficients(self, "A"), unit_coefficients(self, "B")])
 	
 	def MaxLoadA(self):
 		""" Returns the maximum of the sum of all OD LoadA.
@@ -153,14 +318,7 @@ class Corridor():
 		It is the highest number of people traveling at the same time at the same
 		place on the corridor in one direction.
 		"""
-		m = 0 # Current maximum
-		for x in range(100):
-			l = 0 # Load at abscisse x
-			for od in self.demand:
-				l += od.LoadA(self, x*self.length/100.0)
-			if l > m:
-				m = l
-		return m
+		return self.LoadProfileA().Max()
 			
 	def MaxLoadB(self):
 		""" Returns the maximum of the sum of all OD LoadB.
@@ -168,32 +326,19 @@ class Corridor():
 		It is the highest number of people traveling at the same time at the same
 		place on the corridor in one direction.
 		"""
-		m = 0 # Current maximum
-		for x in range(100):
-			l = 0 # Load at abscisse x
-			for d in self.demand:
-				l += d.LoadB(self, x*self.length/100.0)
-			if l > m:
-				m = l	
-		return m
+		return self.LoadProfileB().Max()
 	
 	def WeightedTravelTime(self, param):
 		""" Computes the total weighted travel time for all the demand on the whole
 		network.
 		"""
-		wtt = 0
-		for od in self.demand:
-			wtt += od.demand * od.WeightedTravelTime(param, self.lines)
-		return wtt
+		return self.GetLogit(param).WeightedTravelTime()
 	
 	def GeneralizedCost(self, param):
 		""" Computes the total generalized cost for all the demand on the whole
 		network.
 		"""
-		gc = 0
-		for od in self.demand:
-			gc += od.demand * od.GeneralizedCost(param, self.lines)
-		return gc
+		return self.GetLogit(param).GeneralizedCost()
 				
 	def OperatingCost(self, param):
 		""" Computes the total operating cost of the network. """
@@ -218,62 +363,69 @@ class Corridor():
 		
 	def TotalRevenues(self, param):
 		""" Computes the total revenues of all operators. """
-		r = 0
-		for od in self.demand:
-			for line in self.lines:
-				if line.m != 0:
-					r += od.ModalSplit(param, self.lines, line) * od.demand * line.price
-		return r
+		return self.GetLogit(param).TotalRevenues()
 		
 	def Revenues(self, param, line):
 		""" Computes the revenues for the given line. """
-		r = 0
-		if line.m != 0:
-			for od in self.demand:
-				r += od.ModalSplit(param, self.lines, line) * od.demand * line.price
-			return r
-		else:
-			return 0
+		logit = self.GetLogit(param)
+		return float(logit.LineRevenues()[logit.Index(line)])
 
 	def TotalCost(self, param):
 		""" Computes the total cost of the network (travelers + operators). """
 		return self.GeneralizedCost(param) + self.OperatorCost(param) - self.TotalRevenues(param)
 
+	def ReferenceCosts(self, param):
+		""" Returns the generalized cost (logsum) of each OD with self.lines,
+		whatever its level of demand.
+		
+		These costs are the reference (gc0) of elastic demand and consumer surplus.
+		They are cached and only recomputed when the geometry, the attributes of
+		the OD (but not their demand), the lines or the parameters change. With
+		crowding, they are the costs at the equilibrium, which also depend on
+		the demand.
+		"""
+		if param.Crowded():
+			key = (param.Key(), self.GeometryKey(), self.od.revision, self.LinesKey())
+			return self.Cached("reference_costs", key, lambda: self.GetLogit(param).logsum)
+		key = (param.Key(), self.GeometryKey(), self.od.attributes_revision, self.LinesKey())
+		return self.Cached("reference_costs", key, lambda: Logit(self, param).logsum)
+	
+	def ElasticDemand(self, param, corridor):
+		""" Returns the level of demand of each OD (in the order of self.demand)
+		if self.lines were replaced by corridor.lines and if demand was elastic.
+		
+		With crowding, it is the demand at the equilibrium (see Equilibrium).
+		"""
+		if param.Crowded():
+			return Equilibrium(param, corridor, self).Solve().demand
+		d0 = self.od.Flat("demand")
+		gc0 = np.where(d0 == 0, 0.0, self.ReferenceCosts(param))
+		gc = self.GetLogit(param, corridor.lines).gc
+		return elastic_demand(d0, gc0, gc, param.captive, param.gamma)
+
 	def GetElasticDemand(self, param, corridor):
 		""" Return the demand if self.lines were replaced by 
 		corridor.lines and if demand was elastic.
 		"""
 		demand = []
-		c = param.captive
-		for od in self.demand:
-			if od.demand == 0:
-				d = 0
-			else:
-				gc0 = od.GeneralizedCost(param, self.lines)
-				gc = od.GeneralizedCost(param, corridor.lines)
-				if gc0 == float("inf"):
-					d = od.demand
-				elif gc == float("inf"):
-					d = 0
-				else:
-					d = od.demand * (c + (1 - c) * (gc0/gc)**(param.gamma))
+		for od, d in zip(self.demand, self.ElasticDemand(param, corridor)):
 			demand.append(OD(self, od.origin, od.dest, d))
 		
 		return demand
 
 	def GetConsumerSurplus(self, param, corridor):
 		""" Returns the consumer surplus of the given corridor where the reference is self. """
+		gc0 = np.where(corridor.od.Flat("demand") == 0, 0.0, self.ReferenceCosts(param))
+		gc = corridor.GetLogit(param).gc
+		
 		cs = 0
-		for od in corridor.demand:
-			gc0 = od.GeneralizedCost(param, self.lines)
-			gc = od.GeneralizedCost(param, corridor.lines)
-			
-			if gc == float("inf"):
+		for i, od in enumerate(corridor.demand):
+			if gc[i] == float("inf"):
 				return -float("inf")
-			elif gc0 == float("inf"):
+			elif gc0[i] == float("inf"):
 				return float("inf")
 			else:
-				cs += od.demand * 0.5 * (gc0 - gc)
+				cs += od.demand * 0.5 * float(gc0[i] - gc[i])
 			
 		return cs
 	
@@ -285,8 +437,20 @@ class Corridor():
 		""" Return a corridor with the same characteristics but no lines.
 		"""
 		c = Corridor(name, self.length, self.typo)
-		for i in range(c.n):
-			for j in range(c.n):
-				c.GetOD(i, j).demand = self.GetOD(i,j).demand
+		c.n = self.n
+		c.zone_length = list(self.zone_length)
+		c.landmarks = list(self.landmarks)
+		c.od = self.od.Copy()
+		c.CreateViews()
 		return c
 	
+
+
+def zone_name(i):
+	""" Returns the name of the zone i : "A" to "Z", then "AA", "AB"... """
+	name = ""
+	i += 1
+	while i > 0:
+		i, r = divmod(i - 1, 26)
+		name = chr(ord("A") + r) + name
+	return name
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Equilibrium.py
+
+import numpy as np
+
+from Logit import *
+
+class Equilibrium():
+	""" Equilibrium between the demand, the modal split, the loads of the lines
+	and the crowding of the vehicles.
+
+	The in-vehicle time of a line is perceived as (1 + crowding*x^2) times
+	longer, where crowding is the coefficient of its mode (see
+	Parameters.crowding) and x its load ratio (maximum load of the line over
+	its capacity, see Logit.LoadRatios). The splits depend on the load
+	ratios, which depend on the splits (and on the demand if it is elastic, as
+	the demand depends on the generalized costs) : the load ratios are the
+	fixed point x = G(x) of the function G which evaluates the logit model
+	with the crowding of x and returns the resulting load ratios (see Map).
+
+	The fixed point is found by Anderson acceleration : each iterate is the
+	combination of the last memory evaluations of G whose residuals G(x) - x
+	cancel out best (least squares). It needs far fewer evaluations of the
+	logit model than successive substitution x = G(x), which converges slowly
+	or oscillates when crowding is strong.
+
+	Attributes :
+		- param -- Parameters (crowding, eq_tolerance and eq_iterations)
+		- corridor -- Corridor whose lines and OD are used
+		- reference -- Reference corridor if demand is elastic (the demand
+			of corridor is then not used, see Corridor.ElasticDemand), None
+			otherwise
+		- memory -- Number of previous iterates used by the acceleration
+		- logit -- Logit model of the corridor, evaluated with the crowding
+			of the last iterate
+		- elastic_logit -- Logit model of the lines of the corridor for the OD
+			of the reference (if demand is elastic)
+	"""
+
+	def __init__(self, param, corridor, reference=None, memory=5):
+		self.param = param
+		self.corridor = corridor
+		self.reference = reference
+		self.memory = memory
+
+		self.logit = Logit(corridor, param)
+		self.elastic_logit = None
+		if reference != None:
+			self.elastic_logit = Logit(reference, param, corridor.lines)
+			self.demand0 = reference.od.Flat("demand")
+			self.costs0 = np.where(self.demand0 == 0, 0.0, reference.ReferenceCosts(param))
+
+		self.crowding = np.array([param.crowding[m] for m in self.logit.mode], dtype=float)
+
+	def Penalty(self, x):
+		""" Returns the increase of the in-vehicle time of each line (share of
+		the in-vehicle time) for the load ratios x.
+		"""
+		return self.crowding * x**2
+
+	def Map(self, x):
+		""" Evaluates the logit model with the crowding of the load ratios x
+		and returns the resulting load ratio of each line.
+		"""
+		penalty = self.Penalty(x)
+		if self.reference != None:
+			self.elastic_logit.Evaluate(self.demand0, penalty)
+			demand = elastic_demand(self.demand0, self.costs0, self.elastic_logit.gc,
+									self.param.captive, self.param.gamma)
+		else:
+			demand = self.logit.demand
+		self.logit.Evaluate(demand, penalty)
+		return self.logit.LoadRatios()
+
+	def Solve(self):
+		""" Iterates until the load ratios change by less than eq_tolerance or
+		until eq_iterations evaluations of the logit model.
+
+		Returns the logit model at the equilibrium, whose attribute equilibrium
+		gives the diagnostics : "converged", number of "iterations", final
+		"residual" (largest change of a load ratio) and the residual of each
+		iteration ("residuals").
+		"""
+		tolerance = self.param.eq_tolerance
+		iterations = self.param.eq_iterations
+
+		# Without crowding
+		x = np.zeros(len(self.crowding))
+		g = self.Map(x)
+		count = 1
+		residuals = []
+		dx = []
+		dr = []
+		while True:
+			# Lines without crowding do not depend on their load ratio
+			r = np.where(self.crowding != 0, g - x, 0.0)
+			residual = float(np.abs(r).max()) if len(r) != 0 else 0.0
+			residuals.append(residual)
+			if residual <= tolerance or count >= iterations:
+				break
+
+			# Anderson acceleration : x_{k+1} = G(x_k) - sum(c_i*(G(x_i+1) - G(x_i)))
+			# with c minimizing |r_k - sum(c_i*(r_i+1 - r_i))|
+			if count > 1:
+				dx.append(g - previous_g)
+				dr.append(r - previous_r)
+				del dx[:-self.memory]
+				del dr[:-self.memory]
+				c = np.linalg.lstsq(np.array(dr).T, r, rcond=None)[0]
+				new_x = g - np.dot(c, np.array(dx))
+				if not np.all(np.isfinite(new_x)):
+					new_x = g
+			else:
+				new_x = g
+			previous_g, previous_r = g, r
+			x = np.maximum(new_x, 0.0)
+			g = self.Map(x)
+			count += 1
+
+		self.logit.equilibrium = {"converged": residual <= tolerance,
+									"iterations": count,
+									"residual": residual,
+									"residuals": residuals}
+		return self.logit
@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# LazyResults.py
+
+class LazyResults():
+	""" Sequence of results (corridors) which are only read when they are
+	accessed, e.g. the results of a study archive (see load_study).
+	
+	Attributes :
+		- entries -- Description of each result, given to load
+		- load -- Function which returns the result described by an entry
+	"""
+	
+	def __init__(self, entries, load):
+		self.entries = list(entries)
+		self.load = load
+		self.results = [None]*len(self.entries)
+	
+	def __len__(self):
+		return len(self.entries)
+	
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return [self[k] for k in range(*i.indices(len(self)))]
+		if self.results[i] is None:
+			self.results[i] = self.load(self.entries[i])
+		return self.results[i]
+	
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+	
+	def Loaded(self):
+		""" Returns the number of results already read. """
+		return len([r for r in self.results if r is not None])
@@ -3,8 +3,19 @@
 
 # Line.py
 
+import numpy as np
+
 class Line():
-	""" This class enables the definition of a transport line. """
+	""" This class enables the definition of a transport line.
+	
+	The stop spacing s and the maximum speed v of each zone are lists : if
+	they are modified in place, Touch has to be called afterwards so that the
+	time table is computed again (see TimeTable).
+	"""
+	
+	# Attributes the time table depends on (it is reset when they are assigned)
+	TIME_ATTRIBUTES = ["corridor", "m", "s", "v", "dt"]
+	
 	def __init__(	self, 
 					corridor,
 					mode,
@@ -41,12 +52,22 @@ class Line():
 		self.k = float(capacity)
 		self.dt = float(dwell_time)
 		self.price = float(price)
+		self.time_table = None # (zone lengths, zone times, table), see TimeTable
 		
 		if name == "":
 			self.name = str(self)
 		else:
 			self.name = name
 	
+	def __setattr__(self, name, value):
+		if name in Line.TIME_ATTRIBUTES:
+			self.__dict__["time_table"] = None
+		self.__dict__[name] = value
+	
+	def Touch(self):
+		""" Marks the stop spacing or the speeds as modified in place. """
+		self.time_table = None
+	
 	def GetCommercialSpeed(self, zone=-1):
 		""" Computes the commercial speed (v=d/t + time lost at stations).
 		If zone is specified and valid, returns the commercial speed in this zone.
@@ -60,10 +81,42 @@ class Line():
 				else:
 					return self.v[zone]
 		else:
-			denom = 0
-			for i in range(self.corridor.n):
-				denom += self.corridor.zone_length[i]/self.GetCommercialSpeed(i)
-		return self.corridor.length/denom
+			return self.corridor.length/float(self.TimeTable()[-1])
+	
+	def ZoneTimes(self):
+		""" Returns the running time in each zone (zone_length/commercial speed). """
+		self.TimeTable()
+		return self.time_table[1]
+	
+	def TimeTable(self):
+		""" Returns the running time from the beginning of the corridor to the
+		limits of each zone (prefix sums of ZoneTimes, n+1 values) : the
+		running time between two landmarks is a difference.
+		
+		The table is kept until an attribute of the line it depends on is
+		assigned (see TIME_ATTRIBUTES) or Touch is called, and until the
+		zones of the corridor change : the lists of zone lengths are replaced,
+		never modified in place (see Corridor.SetZones), so the table keeps
+		the list it was computed with and only compares its identity.
+		"""
+		corridor = self.corridor
+		if self.time_table == None or self.time_table[0] is not corridor.zone_length:
+			zone_time = np.zeros(corridor.n)
+			for i in range(corridor.n):
+				zone_time[i] = corridor.zone_length[i]/self.GetCommercialSpeed(i)
+			table = np.zeros(corridor.n + 1)
+			table[1:] = np.cumsum(zone_time)
+			self.time_table = (corridor.zone_length, zone_time, table)
+		return self.time_table[2]
+	
+	def ZoneTimeDerivative(self, zone):
+		""" Returns the derivative of the running time in the given zone
+		(zone_length/commercial speed) with respect to the stop spacing in this zone.
+		"""
+		if self.m != 0 and self.s[zone] <= self.corridor.zone_length[zone]:
+			return -self.corridor.zone_length[zone]*self.dt/self.s[zone]**2
+		else:
+			return 0
 	
 	def VehiclesNumber(self):
 		""" Computes the number of vehicles needed to operate. """
@@ -92,6 +145,29 @@ class Line():
 		""" Computes the total operator cost. """
 		return self.OperatingCost(param) + self.InfraCost(param)
 	
+	def OperatorCostGradient(self, param):
+		""" Returns the derivatives of the operator cost with respect to the
+		frequency and to the stop spacing in each zone.
+		"""
+		n = self.corridor.n
+		if self.m == 0:
+			return 0, [0]*n
+		
+		c = param.cexp[self.m] + param.cinf[self.m]
+		t = self.corridor.length / self.GetCommercialSpeed()
+		d_f = c * 2.0*t
+		d_s = []
+		for i in range(n):
+			d = c * 2.0*self.f*self.ZoneTimeDerivative(i)
+			if self.s[i] < self.corridor.zone_length[i]:
+				d -= param.csta[self.m]*self.corridor.zone_length[i]/self.s[i]**2
+			d_s.append(d)
+		return d_f, d_s
+	
+	def Key(self):
+		""" Returns a tuple of the attributes which define the line. """
+		return (self.m, self.f, tuple(self.s), tuple(self.v), self.k, self.dt, self.price)
+	
 	def Duplicate(self):
 		""" Returns an identical line. """
 		s = []
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# LoadProfile.py
+
+import numpy as np
+
+class LoadProfile():
+	""" Exact load profile of a corridor in one direction.
+
+	The load of each OD (see OD.LoadA and OD.LoadB) is linear or quadratic
+	between two landmarks of the corridor, so the total load is a polynomial
+	a*x^2 + b*x + c in each zone. The profile keeps these coefficients, which
+	gives the exact load at any abscisse and the exact maximum without sampling.
+
+	Attributes :
+		- landmarks -- Abscisses of zones' limits
+		- coef -- Coefficients (a, b, c) of the load in each zone (n x 3)
+	"""
+
+	def __init__(self, corridor, direction, weights=None):
+		""" Builds the profile of the given direction ("A" for right to left,
+		"B" for left to right). weights gives the number of travelers of each OD
+		in the order of corridor.demand (the demand of each OD by default).
+		"""
+		n = corridor.n
+		landmarks = np.array(corridor.landmarks, dtype=float)
+		zone_length = np.array(corridor.zone_length, dtype=float)
+		self.landmarks = landmarks
+
+		origin = corridor.od.origin
+		dest = corridor.od.dest
+		trip_length = corridor.od.Flat("trip_length")
+		w = corridor.od.Flat("demand")
+		if weights is not None:
+			w = np.asarray(weights, dtype=float)
+		self.direction = direction
+		self.zone_length = zone_length
+		self.origin = origin
+		self.dest = dest
+		self.trip_length = trip_length
+
+		a = np.zeros(n)
+		b = np.zeros(n)
+		c = np.zeros(n)
+		plateau = np.zeros(n + 1)
+
+		# Intra-zone trips : w*x*(1 - x/tl)/tl on the whole corridor
+		intra = (origin == dest) & (w != 0)
+		tl = trip_length[intra]
+		a -= (w[intra] / tl**2).sum()
+		b += (w[intra] / tl).sum()
+
+		# Trips in the given direction : the load grows linearly in the zone where
+		# travelers board, is constant in the crossed zones and decreases linearly
+		# in the zone where they alight.
+		if direction == "A":
+			sel = (origin > dest) & (w != 0)
+			first = dest[sel]
+			last = origin[sel]
+		else:
+			sel = (origin < dest) & (w != 0)
+			first = origin[sel]
+			last = dest[sel]
+		ws = w[sel]
+		np.add.at(b, first, ws / zone_length[first])
+		np.add.at(c, first, -ws * landmarks[first] / zone_length[first])
+		np.add.at(b, last, -ws / zone_length[last])
+		np.add.at(c, last, ws * landmarks[last + 1] / zone_length[last])
+		np.add.at(plateau, first + 1, ws)
+		np.add.at(plateau, last, -ws)
+		c += np.cumsum(plateau)[:n]
+
+		self.coef = np.column_stack((a, b, c))
+
+	def Load(self, x):
+		""" Returns the load at abscisse(s) x. """
+		x = np.asarray(x, dtype=float)
+		zone = np.clip(np.searchsorted(self.landmarks, x, side="right") - 1, 0, len(self.coef) - 1)
+		a, b, c = self.coef[zone].T
+		return a*x**2 + b*x + c
+
+	def Breakpoints(self):
+		""" Returns the abscisses and the loads which fully describe the profile :
+		landmarks and vertices of the parabolas inside the zones.
+		"""
+		x = list(self.landmarks)
+		for k in range(len(self.coef)):
+			a, b, c = self.coef[k]
+			if a < 0:
+				v = -b / (2*a)
+				if v > self.landmarks[k] and v < self.landmarks[k+1]:
+					x.append(v)
+		x = np.array(sorted(x))
+		return x, self.Load(x)
+
+	def Max(self):
+		""" Returns the maximum load (it is never lower than 0). """
+		x, load = self.Breakpoints()
+		return max(0.0, float(load.max()))
+
+	def ArgMax(self):
+		""" Returns the abscisse of the maximum load. """
+		x, load = self.Breakpoints()
+		return float(x[np.argmax(load)])
+
+	def UnitLoads(self, x):
+		""" Returns the load of each OD at abscisse x for one traveler
+		(i.e. the derivative of the load at x with respect to the weights).
+		"""
+		L = self.landmarks
+		k = min(max(np.searchsorted(L, x, side="right") - 1, 0), len(self.coef) - 1)
+		if self.direction == "A":
+			sel = self.origin > self.dest
+			first = self.dest
+			last = self.origin
+		else:
+			sel = self.origin < self.dest
+			first = self.origin
+			last = self.dest
+		
+		u = np.where(sel & (first < k) & (k < last), 1.0, 0.0)
+		u = np.where(sel & (first == k), (x - L[first]) / self.zone_length[first], u)
+		u = np.where(sel & (last == k), (L[last + 1] - x) / self.zone_length[last], u)
+		intra = self.origin == self.dest
+		tl = np.where(intra, self.trip_length, 1.0)
+		u = np.where(intra, x * (1 - x/tl) / tl, u)
+		return u
+
+
+def unit_coefficients(corridor, direction):
+	""" Returns the coefficients (a, b, c) of the load in each zone for one
+	traveler of each OD (OD x zones x 3) : the coefficients of a profile
+	(see LoadProfile) are the sum of these ones weighted by the demand.
+	"""
+	n = corridor.n
+	landmarks = np.array(corridor.landmarks, dtype=float)
+	zone_length = np.array(corridor.zone_length, dtype=float)
+	origin = corridor.od.origin
+	dest = corridor.od.dest
+	trip_length = corridor.od.Flat("trip_length")
+	nb_od = len(origin)
+	u = np.zeros((nb_od, n, 3))
+
+	intra = origin == dest
+	tl = trip_length[intra]
+	u[intra, :, 0] = -1 / tl[:, None]**2
+	u[intra, :, 1] = 1 / tl[:, None]
+
+	if direction == "A":
+		sel = origin > dest
+		first = dest
+		last = origin
+	else:
+		sel = origin < dest
+		first = origin
+		last = dest
+	k = np.arange(nb_od)[sel]
+	first = first[sel]
+	last = last[sel]
+	u[k, first, 1] += 1 / zone_length[first]
+	u[k, first, 2] -= landmarks[first] / zone_length[first]
+	u[k, last, 1] -= 1 / zone_length[last]
+	u[k, last, 2] += landmarks[last + 1] / zone_length[last]
+	zones = np.arange(n)[None, :]
+	u[k, :, 2] += (zones > first[:, None]) & (zones < last[:, None])
+	return u
+
+def batched_max(landmarks, coef):
+	""" Returns the maximum load (never lower than 0) of profiles given by their
+	coefficients (profiles x zones x 3), see LoadProfile.Max.
+	"""
+	return batched_peaks(landmarks, coef)[0]
+
+def batched_peaks(landmarks, coef):
+	""" Returns the maximum load (never lower than 0) of profiles given by their
+	coefficients (profiles x zones x 3) and its abscisse, see LoadProfile.Max
+	and LoadProfile.ArgMax.
+	"""
+	landmarks = np.asarray(landmarks, dtype=float)
+	n = coef.shape[1]
+	a, b, c = coef[:, :, 0], coef[:, :, 1], coef[:, :, 2]
+
+	# Landmarks (the last one belongs to the last zone)
+	zone = np.minimum(np.arange(n + 1), n - 1)
+	x = landmarks[None, :]
+	load = (a[:, zone]*x + b[:, zone])*x + c[:, zone]
+
+	# Vertices of the parabolas inside the zones
+	with np.errstate(divide="ignore", invalid="ignore"):
+		v = -b / (2*a)
+		inside = (a < 0) & (v > landmarks[None, :-1]) & (v < landmarks[None, 1:])
+		vertex = np.where(inside, (a*v + b)*v + c, -np.inf)
+	load = np.concatenate((load, vertex), axis=1)
+	x = np.concatenate((np.broadcast_to(x, (len(coef), n + 1)), np.where(inside, v, 0.0)), axis=1)
+	k = np.argmax(load, axis=1)
+	rows = np.arange(len(coef))
+	return np.maximum(load[rows, k], 0.0), x[rows, k]
+
+def unit_loads(coef, landmarks, x):
+	""" Returns the load of one traveler of each OD, given by their
+	coefficients (OD x zones x 3, see unit_coefficients), at each abscisse of
+	x (OD x abscisses).
+	"""
+	x = np.asarray(x, dtype=float)
+	k = np.clip(np.searchsorted(landmarks, x, side="right") - 1, 0, coef.shape[1] - 1)
+	return (coef[:, k, 0]*x + coef[:, k, 1])*x + coef[:, k, 2]
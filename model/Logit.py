@@ -0,0 +1,285 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Logit.py
+
+import numpy as np
+
+from LoadProfile import *
+
+class Logit():
+	""" Vectorized evaluation of the logit model for all the OD of a corridor
+	and all the lines of a choice set.
+
+	Every quantity is computed once as a matrix (rows are the OD in the order
+	of corridor.demand, columns are the lines in the order of the choice set)
+	so that aggregates do not have to call OD.ModalSplit for each (OD, line) pair.
+
+	Attributes :
+		- corridor -- Corridor which gives the geometry and the OD
+		- param -- Parameters
+		- lines -- The choice set (corridor.lines by default)
+		- demand -- Level of demand of each OD
+		- trip_length -- Trip length of each OD
+		- mode -- Mode of each line
+		- access, waiting, invehicle, egress -- Time components (OD x lines)
+		- base_cost -- Observable utility of each line for each OD without
+			crowding (OD x lines)
+		- cost -- Observable utility of each line for each OD (OD x lines)
+		- split -- Modal split of each line for each OD (OD x lines)
+		- gc -- Generalized cost (logsum) of each OD (zero if there is no demand)
+		- logsum -- Generalized cost of each OD whatever its level of demand
+		- capacity -- Capacity of each line (f*k)
+		- peaks -- Peak loads of the lines, computed on demand (see LinePeaks)
+		- equilibrium -- Convergence diagnostics if the model is the result of
+			an Equilibrium, None otherwise
+		- zone_share -- Share of the running time of each zone in the in-vehicle
+			time of each OD (OD x zones)
+	"""
+
+	def __init__(self, corridor, param, lines=None):
+		self.corridor = corridor
+		self.param = param
+		if lines is None:
+			lines = corridor.lines
+		self.lines = lines
+
+		n = corridor.n
+		nb_lines = len(lines)
+
+		# OD attributes
+		od = corridor.od
+		origin = od.origin
+		dest = od.dest
+		demand = od.Flat("demand")
+		fd = od.Flat("fd")
+		fw = od.Flat("fw")
+		fe = od.Flat("fe")
+		va = od.Flat("va")
+		ve = od.Flat("ve")
+		trip_length = od.Flat("trip_length")
+		nb_od = len(demand)
+		self.origin = origin
+		self.dest = dest
+		self.fd = fd
+		self.fw = fw
+		self.fe = fe
+		self.va = va
+		self.ve = ve
+		self.trip_length = trip_length
+
+		# Line attributes
+		mode = np.zeros(nb_lines, dtype=int)
+		transit = np.zeros(nb_lines, dtype=bool)
+		car = np.zeros(nb_lines, dtype=bool)
+		f = np.ones(nb_lines)
+		capacity = np.zeros(nb_lines)
+		price = np.zeros(nb_lines)
+		alpha = np.zeros(nb_lines)
+		s = np.zeros((nb_lines, n))
+		zone_time = np.zeros((nb_lines, n))
+		# Running time from the beginning of the corridor to the beginning of
+		# each zone (lines x (n+1), see Line.TimeTable)
+		cum_time = np.zeros((nb_lines, n + 1))
+		for j, line in enumerate(lines):
+			mode[j] = line.m
+			transit[j] = line.m != 0
+			car[j] = line.m == 0
+			f[j] = line.f
+			capacity[j] = line.f * line.k
+			price[j] = line.price
+			alpha[j] = param.alpha[line.m]
+			s[j] = line.s[:n]
+			zone_time[j] = line.ZoneTimes()
+			cum_time[j] = line.TimeTable()
+		self.mode = mode
+		self.transit = transit
+		self.price = price
+		self.capacity = capacity
+		self.zone_time = zone_time
+
+		with np.errstate(divide="ignore", invalid="ignore"):
+			# Access, waiting and egress times (zero for car)
+			self.access = np.where(transit, fd[:, None] * s[:, origin].T / (2 * va[:, None]), 0.0)
+			self.egress = np.where(transit, fe[:, None] * s[:, dest].T / (2 * ve[:, None]), 0.0)
+			self.waiting = np.where(transit, fw[:, None] / f[None, :], 0.0)
+
+			# In-vehicle time : half of origin and destination zones plus zones
+			# between them, a quarter of the zone for intra-zone trips
+			a = np.minimum(origin, dest)
+			b = np.maximum(origin, dest)
+			intra = (a == b)[:, None]
+			ends = 0.5 * (zone_time[:, a] + zone_time[:, b]).T
+			between = (cum_time[:, b] - cum_time[:, np.minimum(a + 1, b)]).T
+			self.invehicle = np.where(intra, 0.25 * zone_time[:, a].T, ends + between)
+
+			# Share of each zone's running time in the in-vehicle time (OD x zones)
+			zones = np.arange(n)[None, :]
+			self.zone_share = np.where((zones > a[:, None]) & (zones < b[:, None]), 1.0, 0.0)
+			self.zone_share[np.arange(nb_od), a] = np.where(a == b, 0.25, 0.5)
+			self.zone_share[np.arange(nb_od), b] += np.where(a == b, 0.0, 0.5)
+
+			# Observable utilities
+			self.wtt = param.wa * self.access + param.ww * self.waiting + \
+						param.wt * self.invehicle + param.we * self.egress
+			self.base_cost = param.ctime * self.wtt + price[None, :] + alpha[None, :]
+			self.base_cost += np.where(car, param.car_price * trip_length[:, None], 0.0)
+
+		# Logit model
+		self.equilibrium = None
+		self.Evaluate(demand)
+
+	def Evaluate(self, demand, penalty=None):
+		""" Computes the utilities, the splits and the generalized costs for
+		the given level of demand of each OD. penalty gives the increase of the
+		in-vehicle time of each line caused by crowding (share of the in-vehicle
+		time, see Equilibrium).
+		"""
+		self.demand = demand
+		self.cost = self.base_cost
+		if penalty is not None:
+			with np.errstate(invalid="ignore"):
+				crowding = self.param.ctime * self.param.wt * self.invehicle * penalty[None, :]
+			self.cost = self.base_cost + np.where(penalty[None, :] != 0, crowding, 0.0)
+		self.split, self.logsum = log_sum_exp(self.cost, demand)
+		self.gc = np.where(demand == 0, 0.0, self.logsum)
+		self.peaks = None
+
+	def Index(self, line):
+		""" Returns the column of the given line in the choice set. """
+		for j, l in enumerate(self.lines):
+			if l is line:
+				return j
+		raise ValueError("line has to be in the choice set")
+
+	def TravelTime(self):
+		""" Returns the total travel time of each line for each OD (OD x lines). """
+		return self.access + self.waiting + self.invehicle + self.egress
+
+	def Flows(self):
+		""" Returns the number of travelers of each OD on each line (OD x lines). """
+		return self.demand[:, None] * self.split
+
+	def LineDemand(self):
+		""" Returns the demand of each line of the choice set. """
+		return self.Flows().sum(axis=0)
+
+	def LinePeaks(self):
+		""" Returns the maximum load of each line of the choice set in its most
+		loaded direction, the direction (0 for "A", 1 for "B") and the abscisse
+		where it is reached.
+		
+		The load profiles of all the lines are computed at once from the flows
+		of each OD on each line (see Corridor.UnitLoads), so a line which
+		attracts long trips gets its own peak.
+		"""
+		if self.peaks is None:
+			flows = self.Flows().T
+			peaks = []
+			abscisses = []
+			for u in self.corridor.UnitLoads():
+				p, x = batched_peaks(self.corridor.landmarks, np.tensordot(flows, u, axes=1))
+				peaks.append(p)
+				abscisses.append(x)
+			peaks = np.array(peaks)
+			direction = np.argmax(peaks, axis=0)
+			lines = np.arange(len(self.lines))
+			self.peaks = (peaks[direction, lines], direction, np.array(abscisses)[direction, lines])
+		return self.peaks
+
+	def LineMaxLoads(self):
+		""" Returns the maximum load of each line of the choice set (see LinePeaks). """
+		return self.LinePeaks()[0]
+
+	def LoadRatios(self):
+		""" Returns the maximum load over the capacity of each line of the
+		choice set (zero if it has no capacity).
+		"""
+		with np.errstate(divide="ignore", invalid="ignore"):
+			ratio = self.LineMaxLoads() / self.capacity
+		return np.where(self.capacity != 0, ratio, 0.0)
+
+	def PeakUnitLoads(self):
+		""" Returns the load of one traveler of each OD at the peak of each
+		line (OD x lines) : the derivative of the maximum load of a line with
+		respect to the flows of each OD on it.
+		"""
+		peaks, direction, x = self.LinePeaks()
+		loads = np.zeros((len(self.demand), len(self.lines)))
+		for d, u in enumerate(self.corridor.UnitLoads()):
+			lines = direction == d
+			loads[:, lines] = unit_loads(u, self.corridor.landmarks, x[lines])
+		return loads
+
+	def LineRevenues(self):
+		""" Returns the revenues of each line of the choice set (zero for car). """
+		return np.where(self.transit, self.LineDemand() * self.price, 0.0)
+
+	def TotalRevenues(self):
+		""" Returns the total revenues of all operators. """
+		return float(self.LineRevenues().sum())
+
+	def GeneralizedCost(self):
+		""" Returns the total generalized cost of all the demand. """
+		gc = np.where(self.demand == 0, 0.0, self.demand * self.gc)
+		return float(gc.sum())
+
+	def WeightedTravelTime(self):
+		""" Returns the total weighted travel time of all the demand. """
+		if len(self.lines) == 0:
+			return float((self.demand * float("inf")).sum())
+		return float((self.demand * (self.split * self.wtt).sum(axis=1)).sum())
+
+	def AvgTravelTime(self):
+		""" Returns the average travel time of all the demand. """
+		p = self.Flows()
+		tt = self.TravelTime()
+		if np.any((p != 0) & np.isinf(tt)):
+			return float("inf")
+		q = p.sum()
+		if q != 0:
+			return float((p * tt).sum() / q)
+		else:
+			return float("inf")
+
+
+def elastic_demand(d0, gc0, gc, captive, gamma):
+	""" Returns the elastic demand d0*(c + (1-c)*(gc0/gc)^gamma) of each OD,
+	where d0 and gc0 are the demand and the generalized cost of the reference
+	and gc the generalized cost of the scenario.
+
+	The demand is zero if gc is infinite and d0 if gc0 is infinite. The
+	arguments can have more axes (e.g. one set of parameters per row, see
+	Sweep).
+	"""
+	with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+		d = d0 * (captive + (1 - captive) * (gc0/gc)**gamma)
+	d = np.where(np.isinf(gc), 0.0, d)
+	d = np.where(np.isinf(gc0), d0, d)
+	return np.where(d0 == 0, 0.0, d)
+
+def log_sum_exp(cost, demand=None):
+	""" Returns the modal split and the logsum -log(sum(exp(-cost))) of the
+	utilities cost (... x lines, the lines are the last axis).
+
+	The exponentials are shifted by the cheapest line, so that they never
+	underflow whatever the level of the costs : the logsum is infinite only
+	if all the costs are infinite (or if there is no line). The split is zero
+	where the logsum is infinite and where demand (same shape as the logsum)
+	is zero, it is not computed (None) if demand is not given.
+	"""
+	with np.errstate(invalid="ignore", over="ignore"):
+		if cost.shape[-1] == 0:
+			shift = np.full(cost.shape[:-1], float("inf"))
+		else:
+			shift = cost.min(axis=-1)
+		finite = np.isfinite(shift)
+		base = np.where(finite, shift, 0.0)
+		expo = np.exp(base[..., None] - cost)
+		denom = expo.sum(axis=-1)
+		logsum = np.where(finite, base - np.log(np.where(finite, denom, 1)), shift)
+		if demand is None:
+			return None, logsum
+		valid = (demand != 0) & finite
+		split = np.where(valid[..., None], expo / np.where(valid, denom, 1)[..., None], 0.0)
+	return split, logsum
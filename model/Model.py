@@ -4,13 +4,23 @@
 # Model.py
 
 from scipy.optimize import minimize
-import wx
+from multiprocessing import Pool
 from math import exp
 
 from Corridor import *
 from Line import *
 from OD import *
+from Objective import *
 from Parameters import *
+from Profiler import *
+from Progress import *
+from ResultCache import *
+from Summary import *
+
+
+class Interrupted(Exception):
+	""" Raised to stop the optimization of a scenario (see Model.Monitor). """
+	pass
 
 
 class Model():
@@ -38,10 +48,39 @@ class Model():
 		#	- simulations : [[corridor to simulate, elasticity (boolean)],...]
 		#	- optimizations_results : [corridor, ...]
 		#	- simulations_results : [corridor, ...]
+		#	- summaries : [Summary of the reference, of each simulation result,
+		#					of each optimization result]
+		#	- results_success : [[name, success, message], ...]
 		self.optimizations = []
 		self.simulations = []
 		self.optimizations_results = []
 		self.simulations_results = []
+		self.summaries = []
+		self.results_success = []
+		
+		# Number of worker processes used by Calculate (1 to compute the
+		# scenarios one after another in the current process)
+		self.processes = 1
+		
+		# Number of starting points of each optimization (the first one is
+		# given by the lines, the others are drawn inside the bounds) and seed
+		# of the random generator. optimizations_starts contains the diagnostics
+		# of all the starts of each optimization result (see solve_start).
+		self.starts = 1
+		self.seed = None
+		self.optimizations_starts = []
+		
+		# If profile is True, the evaluations of the objective functions are
+		# counted and timed and the iterations of the optimizer are recorded
+		# (see Profiler). optimizations_profiles contains the merged statistics
+		# of all the starts of each optimization result.
+		self.profile = False
+		self.optimizations_profiles = []
+		
+		# Results of the scenarios already computed (see ResultCache) : a
+		# scenario which has not changed is not computed again. None to
+		# disable the cache (it is not used either when profiling).
+		self.cache = ResultCache()
 	
 	def SetLength(self, length):
 		""" Modify the length of all corridors. """
@@ -59,6 +98,16 @@ class Model():
 		for sim in self.simulations:
 			sim[0].GetOD(i,j).demand = demand
 			
+	def SetZones(self, zone_length=None, landmarks=None):
+		""" Defines the zones of the reference corridor by their lengths or
+		landmarks (see Corridor.SetZones).
+		
+		It will erase all scenarios, and the lines of the reference if the
+		number of zones changes. """
+		self.reference.SetZones(zone_length, landmarks)
+		self.length = self.reference.length
+		self.SetTypology(Corridor.CUSTOM)
+	
 	def SetTypology(self, typo):
 		""" Modify the typo of the reference corridor.
 		
@@ -68,39 +117,105 @@ class Model():
 		self.simulations = []
 		self.optimizations_results = []
 		self.simulations_results = []
+		self.summaries = []
 		if self.main_window != None:
 			self.main_window.simulation_panel.UpdateUI()
 			self.main_window.DeleteResults()
 	
-	def Calculate(self):
+	def Calculate(self, progress=None):
 		""" This class computes the model for the different scenarios and
 		give the results to the user interface.
+		
+		progress is a Progress instance which receives the progression (the user
+		interface gives one that displays a progress dialog), the summary of
+		each scenario as soon as it is computed, and which can cancel the
+		computation or a scenario (see Progress.Cancelled) : the scenarios
+		computed until then are kept.
+		If self.processes is greater than 1, scenarios are computed in parallel
+		by a pool of worker processes.
 		"""
 		
-		# Opening a progess dialog and creating variables to estimate the progression
-		if self.main_window != None:
-			self.progress_dialog = wx.ProgressDialog(	"Simulation et optimisation", 
-														"Calculs en cours")
-			self.progress_dialog.Update(0)
+		# Creating variables to estimate the progression
+		if progress == None:
+			progress = Progress()
+		self.progress = progress
 		self.progress_total = 1 + len(self.simulations) + len(self.optimizations)
 		self.progress_count = 0
+		self.progress.Start(self.progress_total)
 		
-		# Deleting all former results
-		self.optimizations_results = []
-		self.simulations_results = []
-		if self.main_window != None:
-			self.main_window.DeleteResults()
-		self.results_success = [] # Elements : [name, success, message]
-		
-		# Computing the model
-		self.Simulate()
-		self.Optimize()	
+		try:
+			# Deleting all former results
+			self.optimizations_results = []
+			self.simulations_results = []
+			self.optimizations_starts = []
+			self.optimizations_profiles = []
+			self.summaries = []
+			self.finished = {} # Summaries of the results computed, see Finished
+			if self.main_window != None:
+				self.main_window.DeleteResults()
+			self.results_success = [] # Elements : [name, success, message]
+			
+			# Computing the generalized costs of the reference once for all the
+			# scenarios (they are sent with the reference to worker processes)
+			self.reference.ReferenceCosts(self.param)
+			
+			# Computing the model
+			if self.processes > 1:
+				self.CalculateParallel()
+			else:
+				self.Simulate()
+				self.Optimize()	
+			self.Summarize()
+		finally:
+			self.progress.Finish()
 					
 		if self.main_window != None:
 			self.main_window.InsertResults()
-			self.progress_dialog.Update(100)
-			if self.results_success:
-				self.main_window.SuccessDialog(self.results_success)
+		if self.main_window != None and self.results_success:
+			self.main_window.SuccessDialog(self.results_success)
+	
+	def Finished(self, result):
+		""" Computes the summary of a result as soon as it is computed and gives
+		it to the progress.
+		"""
+		summary = Summary(self.param, self.reference, result)
+		self.finished[id(result)] = summary
+		if summary.equilibrium != None and not summary.equilibrium["converged"]:
+			self.results_success.append([summary.name, False, "Équilibre non atteint"])
+		self.progress.Result(summary)
+	
+	def ReportInterrupted(self, name):
+		""" Reports that the computation of the scenario name has been cancelled. """
+		self.results_success.append([name, False, "Calcul interrompu"])
+		self.UpdateProgress(name)
+	
+	def Monitor(self, name):
+		""" Returns the function called after each iteration of the optimization
+		of the scenario name (see solve_start) : it reports the iteration and
+		raises Interrupted if the computation or the scenario is cancelled.
+		"""
+		iterations = [0]
+		def monitor(objective):
+			iterations[0] += 1
+			self.progress.Iteration(name, iterations[0], objective.last_value)
+			if self.progress.Cancelled() or self.progress.Cancelled(name):
+				raise Interrupted(name)
+		return monitor
+	
+	def Summarize(self):
+		""" Computes the summary of the reference and of each result (see Summary). """
+		self.summaries = []
+		finished = getattr(self, "finished", {})
+		for r in [self.reference] + self.simulations_results + self.optimizations_results:
+			if id(r) in finished:
+				self.summaries.append(finished[id(r)])
+			else:
+				self.summaries.append(Summary(self.param, self.reference, r))
+	
+	def UpdateProgress(self, name=""):
+		""" Counts one more computed scenario and reports the progression. """
+		self.progress_count += 1
+		self.progress.Update(self.progress_count, self.progress_total, name)
 	
 	def Simulate(self):
 		""" Computes all the simulation scenarios.
@@ -108,16 +223,16 @@ class Model():
 		Uses self.simulations as input and self.simulations_results as output.
 		"""
 		for sim in self.simulations:
-			corridor = sim[0]
-			elasticity = sim[1]
-			# If demand is elastic, we calculate the new demand
-			if elasticity:
-				corridor.demand = self.reference.GetElasticDemand(self.param, corridor)
-			self.simulations_results.append(corridor)
-			# Updating progress dialog
-			self.progress_count += 1
-			if self.main_window != None:
-				self.progress_dialog.Update(100*self.progress_count/self.progress_total)
+			if self.progress.Cancelled():
+				return
+			key = self.SimulationKey(sim)
+			result = self.CachedResult(key)
+			if result == None:
+				result = simulate_scenario(self.param, self.reference, sim)
+				self.CacheResult(key, result)
+			self.simulations_results.append(result)
+			self.Finished(result)
+			self.UpdateProgress(sim[0].name)
 	
 	
 	def	Optimize(self):
@@ -126,131 +241,263 @@ class Model():
 		Uses self.optimizations as input and self.optimizations_results as output.
 		"""
 		for opt in self.optimizations:
-			corridor = opt[0] # Corridor with lines which won't get optimized
-			lines = opt[1] # List of lines which will be optimized
-			elasticity = opt[2]
-			
-			def ObjectiveFunction(x):
-				new_corridor = corridor.Duplicate("")
-				
-				# The argument x is a vector that contains the optimization variables
-				# in their order of appearance in the list "lines".
-				c = 0 # A counter to identify the elements of x
-				
-				# Construction of the set of lines for the new corridor
-				# with the data contained in list lines and vector x.
-				for i in range(len(lines)):
-					# Frequency
-					if lines[i].opt[0] == 0:
-						f = lines[i].f
-					else:
-						f = x[c]
-						c += 1
-					
-					# Stop spacing
-					s = []
-					for j in range(corridor.n):
-						if lines[i].opt[1][j] == 0:
-							s.append(lines[i].s[j])
-						else:
-							s.append(x[c])
-							c += 1
-			
-					line = Line(new_corridor,
-								lines[i].m,
-								f,
-								s,
-								lines[i].v,
-								lines[i].k,
-								lines[i].dt,
-								lines[i].price,
-								lines[i].name,
-								lines[i].opt)
-					new_corridor.lines.append(line)
-				
-				for l in corridor.lines:
-					new_corridor.lines.append(l.Duplicate())
-					
-				if elasticity:
-					new_corridor.demand = self.reference.GetElasticDemand(self.param, new_corridor)
-			
-				# Capacity constraints are managed by giving a malus 
-				# if a line is too crowded.
-				malus = 0
-				for l in new_corridor.lines:
-					max_load = new_corridor.Demand(self.param, l) / new_corridor.TotalDemand() * \
-									max(new_corridor.MaxLoadA(), new_corridor.MaxLoadB())
-					capacity = l.f * l.k
-					if max_load > capacity:
-						malus += (max_load - capacity)**2
-				
-				if elasticity:
-					r = -self.reference.TotalSurplus(self.param, new_corridor) + malus
-				else:
-					r = new_corridor.TotalCost(self.param) + malus
-				return r
-			
-			# Defining the optimization program
-			x0 = []
-			bounds = []
-			for i in range(len(lines)):
-				# Frequency
-				if lines[i].opt[0] == 1:
-					x0.append(lines[i].f)
-					bounds.append(lines[i].cons[0])
-				# Stop spacing
-				for j in range(corridor.n):
-					if lines[i].opt[1][j] == 1:
-						x0.append(lines[i].s[j])
-						bounds.append(lines[i].cons[1][j])
-			
-			if len(x0) != 0:
-				r = minimize(ObjectiveFunction, x0, method="L-BFGS-B", bounds=bounds)
-				self.results_success.append([corridor.name, r.success, r.message])
-				
-				# Construction of the set of lines for the new corridor
-				# with the data contained in list lines and optimized vector x.
-				c = 0
-				new_corridor = corridor.Duplicate(corridor.name)
-				
-				# Frequency
-				for i in range(len(lines)):
-					if lines[i].opt[0] == 0:
-						f = lines[i].f
-					else:
-						f = r.x[c]
-						c += 1
-					# Stop spacing
-					s = []
-					for j in range(corridor.n):
-						if lines[i].opt[1][j] == 0:
-							s.append(lines[i].s[j])
-						else:
-							s.append(r.x[c])
-							c += 1
-					
-					line = Line(corridor,
-								lines[i].m,
-								f,
-								s,
-								lines[i].v,
-								lines[i].k,
-								lines[i].dt,
-								lines[i].price,
-								lines[i].name,
-								lines[i].opt)
-					new_corridor.lines.append(line)
-					
-				for l in corridor.lines:
-					new_corridor.lines.append(l.Duplicate())
-				if elasticity:
-					new_corridor.demand = self.reference.GetElasticDemand(self.param, new_corridor)
-				
-				# Updating progress dialog
-				self.progress_count += 1
-				if self.main_window != None:
-					self.progress_dialog.Update(100*self.progress_count/self.progress_total)
+			if self.progress.Cancelled():
+				return
+			key = self.OptimizationKey(opt)
+			result = self.CachedResult(key)
+			if result == None:
+				try:
+					result = optimize_scenario(self.param, self.reference, opt, self.starts, 
+											self.seed, self.profile, self.Monitor(opt[0].name))
+				except Interrupted:
+					self.ReportInterrupted(opt[0].name)
+					continue
+				if result != None:
+					self.CacheResult(key, result)
+			if result != None:
+				self.AppendOptimization(result)
+				self.Finished(result[0])
+			# A scenario without variables is counted as computed (see
+			# CalculateParallel)
+			self.UpdateProgress(opt[0].name)
+	
+	def SimulationKey(self, sim):
+		""" Returns the key of a simulation scenario in self.cache (None if
+		the cache is not used).
+		"""
+		if self.cache == None or self.profile:
+			return None
+		return simulation_key(self.param, self.reference, sim)
+	
+	def OptimizationKey(self, opt):
+		""" Returns the key of an optimization scenario in self.cache (None if
+		the cache is not used or if its result can not be reused).
+		"""
+		if self.cache == None or self.profile:
+			return None
+		return optimization_key(self.param, self.reference, opt, self.starts, self.seed)
+	
+	def CachedResult(self, key):
+		""" Returns the result of the scenario of the given key if it has
+		already been computed, None otherwise.
+		"""
+		if key == None:
+			return None
+		return self.cache.Get(key)
+	
+	def CacheResult(self, key, result):
+		""" Stores the result of the scenario of the given key. """
+		if key != None:
+			self.cache.Set(key, result)
+	
+	def AppendOptimization(self, result):
+		""" Stores the result of optimize_scenario or best_start. """
+		self.results_success.append(result[1])
+		self.optimizations_starts.append(result[2])
+		self.optimizations_results.append(result[0])
+		if self.profile:
+			self.optimizations_profiles.append(merge_stats([r["profile"] for r in result[2]]))
+	
+	def CalculateParallel(self):
+		""" Computes all the simulation and optimization scenarios with a pool
+		of self.processes worker processes.
+		
+		Scenarios, and each starting point of the optimizations, are independent :
+		they are sent to the workers all at once and the results are stored in
+		their original order as soon as they arrive. Scenarios found in
+		self.cache are not sent.
+		
+		The progression is reported for each scenario (not for each iteration
+		of the optimizations). Cancelling the computation stops the workers,
+		the starts of a cancelled scenario are dropped.
+		"""
+		tasks = []
+		nb_sim = len(self.simulations)
+		self.simulations_results = [None]*nb_sim
+		sim_keys = []
+		for i, sim in enumerate(self.simulations):
+			sim_keys.append(self.SimulationKey(sim))
+			result = self.CachedResult(sim_keys[i])
+			if result != None:
+				self.simulations_results[i] = result
+				self.Finished(result)
+				self.UpdateProgress(sim[0].name)
+			else:
+				tasks.append((i, "simulation", (self.param, self.reference, sim)))
+		
+		# Each starting point of an optimization is a task
+		objectives = []
+		starts = []
+		opt_keys = []
+		results = [] # Result of each optimization (see best_start)
+		for opt in self.optimizations:
+			opt_keys.append(self.OptimizationKey(opt))
+			results.append(self.CachedResult(opt_keys[-1]))
+			if results[-1] != None:
+				objectives.append(None)
+				starts.append([])
+				self.Finished(results[-1][0])
+				self.UpdateProgress(opt[0].name)
+				continue
+			objective = Objective(self.param, self.reference, opt[0], opt[1], opt[2])
+			objectives.append(objective)
+			if len(objective.variables) == 0:
+				starts.append([])
+				self.UpdateProgress(opt[0].name)
+				continue
+			points = objective.StartingPoints(self.starts, self.seed)
+			starts.append([None]*len(points))
+			for j in range(len(points)):
+				tasks.append(((len(objectives) - 1, j), "start", (objective, points[j], self.profile)))
+		
+		if tasks:
+			self.RunTasks(tasks, objectives, starts, results)
+		for i, kind, args in tasks:
+			if kind == "simulation" and self.simulations_results[i] != None:
+				self.CacheResult(sim_keys[i], self.simulations_results[i])
+		self.simulations_results = [r for r in self.simulations_results if r != None]
+		
+		for i in range(len(objectives)):
+			if results[i] != None:
+				if objectives[i] != None:
+					self.CacheResult(opt_keys[i], results[i])
+				self.AppendOptimization(results[i])
+	
+	def RunTasks(self, tasks, objectives, starts, results):
+		""" Computes the tasks of CalculateParallel (see compute_scenario) with a
+		pool of worker processes. Simulations are stored in
+		self.simulations_results, starts in starts and the result of an
+		optimization in results as soon as all its starts are computed.
+		"""
+		cancelled = set()
+		pool = Pool(min(self.processes, len(tasks)))
+		try:
+			for i, kind, result in pool.imap_unordered(compute_scenario, tasks):
+				if self.progress.Cancelled():
+					pool.terminate()
+					break
+				if kind == "simulation":
+					self.simulations_results[i] = result
+					self.Finished(result)
+					self.UpdateProgress(result.name)
+					continue
 				
-				self.optimizations_results.append(new_corridor)
-					
+				k = i[0]
+				starts[k][i[1]] = result
+				name = objectives[k].corridor.name
+				if k in cancelled:
+					continue
+				if self.progress.Cancelled(name):
+					cancelled.add(k)
+					self.ReportInterrupted(name)
+				elif not None in starts[k]:
+					results[k] = best_start(objectives[k], starts[k])
+					if results[k] != None:
+						self.Finished(results[k][0])
+					self.UpdateProgress(name)
+		finally:
+			pool.close()
+			pool.join()
+
+
+def simulate_scenario(param, reference, sim):
+	""" Computes a simulation scenario [corridor, elasticity] and returns the
+	resulting corridor.
+	"""
+	corridor = sim[0]
+	elasticity = sim[1]
+	# If demand is elastic, we calculate the new demand
+	if elasticity and param.Crowded():
+		corridor.SetEquilibrium(param, reference)
+	elif elasticity:
+		corridor.SetDemand(reference.ElasticDemand(param, corridor))
+	return corridor
+
+def solve_start(objective, x0, profile=False, monitor=None):
+	""" Minimizes the objective from the starting point x0.
 	
+	Returns the diagnostics of the run as a dictionary (starting point "x0",
+	solution "x", value "fun", "success", "message", number of iterations "nit"
+	and of evaluations "nfev"). If profile is True, it also contains the
+	statistics of the run in "profile" (see Profiler.Stats).
+	monitor is a function called with the objective after each iteration, it
+	can stop the optimization by raising Interrupted.
+	"""
+	x0, bounds = list(x0), objective.Variables()[1]
+	if profile:
+		objective.profiler = Profiler()
+	def callback(x):
+		if profile:
+			objective.profiler.Iteration(x)
+		if monitor != None:
+			monitor(objective)
+	try:
+		r = minimize(objective.ValueAndGradient, x0, method="L-BFGS-B", jac=True, bounds=bounds, callback=callback)
+	finally:
+		profiler = objective.profiler
+		objective.profiler = None
+	d = {"x0": x0,
+		"x": list(r.x),
+		"fun": float(r.fun),
+		"success": bool(r.success),
+		"message": r.message,
+		"nit": int(r.nit),
+		"nfev": int(r.nfev)}
+	if profile:
+		d["profile"] = profiler.Stats()
+	return d
+
+def best_start(objective, starts):
+	""" Returns [optimized corridor, [name, success, message], starts] where the
+	optimized corridor is built from the best solution of the list of runs starts
+	(see solve_start).
+	"""
+	best = starts[0]
+	for r in starts:
+		if r["fun"] < best["fun"] or best["fun"] != best["fun"]:
+			best = r
+	
+	# Construction of the set of lines for the new corridor
+	# with the data contained in list lines and optimized vector x.
+	name = objective.corridor.name
+	new_corridor = objective.BuildCorridor(best["x"], name)
+	if objective.elasticity and objective.equilibrium_param.Crowded():
+		new_corridor.SetEquilibrium(objective.equilibrium_param, objective.reference)
+	return [new_corridor, [name, best["success"], best["message"]], starts]
+
+def optimize_scenario(param, reference, opt, starts=1, seed=None, profile=False, monitor=None):
+	""" Computes an optimization scenario [corridor, lines, elasticity] from
+	the given number of starting points (see Objective.StartingPoints).
+	If profile is True, each start is profiled, monitor is called after each
+	iteration (see solve_start).
+	
+	Returns [optimized corridor, [name, success, message], diagnostics of each
+	start] or None if there is no variable to optimize.
+	"""
+	corridor = opt[0] # Corridor with lines which won't get optimized
+	lines = opt[1] # List of lines which will be optimized
+	elasticity = opt[2]
+	
+	# Defining the optimization program
+	objective = Objective(param, reference, corridor, lines, elasticity)
+	if len(objective.variables) == 0:
+		return None
+	
+	runs = []
+	for x0 in objective.StartingPoints(starts, seed):
+		runs.append(solve_start(objective, x0, profile, monitor))
+	return best_start(objective, runs)
+
+def compute_scenario(task):
+	""" Computes one task in a worker process of Model.CalculateParallel.
+	
+	task is (index, kind, arguments) with kind "simulation" (arguments of
+	simulate_scenario) or "start" (arguments of solve_start, index is then
+	(optimization, start)).
+	Returns (index, kind, result).
+	"""
+	index, kind, args = task
+	if kind == "simulation":
+		return index, kind, simulate_scenario(*args)
+	else:
+		return index, kind, solve_start(*args)
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# MonteCarlo.py
+
+import numpy as np
+from multiprocessing import Pool
+
+from Sweep import *
+
+class MonteCarlo():
+	""" Propagates the uncertainty of the parameters and of the demand to the
+	results of a simulation scenario.
+
+	The uncertain inputs are drawn from the given distributions and all the
+	draws of a batch are evaluated at once (see Sweep).
+
+	Attributes :
+		- sweep -- Sweep of the simulation scenario
+		- distributions -- {parameter : (law, arguments...)} where parameter is
+			given as in Sweep (e.g. "ctime", "cexp[3]", "demand", "demand[2]") and
+			law is a distribution of numpy.random.RandomState with its arguments,
+			e.g. {"ctime": ("normal", 12, 2), "demand": ("lognormal", 0, 0.1)}
+		- seed -- Seed of the random generator (the draws do not depend on the
+			number of processes)
+		- batch -- Number of draws evaluated at once
+	"""
+
+	def __init__(self, param, reference, sim, distributions, seed=None, batch=10000):
+		self.sweep = Sweep(param, reference, sim)
+		self.distributions = distributions
+		for key in distributions:
+			parse_parameter(key)
+		self.seed = seed
+		self.batch = batch
+
+	def Sample(self, number, random):
+		""" Returns number draws of the uncertain inputs {parameter : values}
+		with the given numpy.random.RandomState.
+		"""
+		columns = {}
+		for key in sorted(self.distributions.keys()):
+			law = self.distributions[key]
+			columns[key] = getattr(random, law[0])(*law[1:], size=number)
+		return columns
+
+	def Evaluate(self, number, seed):
+		""" Draws and evaluates number draws with the given seed.
+
+		Returns (draws, results) : {parameter : values} and {result : values}
+		(see Sweep.EvaluateColumns).
+		"""
+		columns = self.Sample(number, np.random.RandomState(seed))
+		return columns, self.sweep.EvaluateColumns(number, columns)
+
+	def Run(self, number, processes=1):
+		""" Evaluates number draws, in batches computed by a pool of worker
+		processes if processes is greater than 1.
+
+		Returns (draws, results) : {parameter : values} and {result : values}
+		with one value per draw (and one column per line for "split" and
+		"line_max_load").
+		"""
+		sizes = [self.batch]*(number // self.batch)
+		if number % self.batch != 0:
+			sizes.append(number % self.batch)
+		seeds = np.random.RandomState(self.seed).randint(0, 2**31 - 1, size=len(sizes))
+		tasks = [(self, sizes[i], int(seeds[i])) for i in range(len(sizes))]
+
+		if processes > 1 and len(tasks) > 1:
+			pool = Pool(min(processes, len(tasks)))
+			try:
+				batches = pool.map(evaluate_draws, tasks)
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			batches = [evaluate_draws(task) for task in tasks]
+
+		draws = {}
+		results = {}
+		for key in self.distributions:
+			draws[key] = np.concatenate([b[0][key] for b in batches])
+		for name in batches[0][1] if batches else []:
+			results[name] = np.concatenate([b[1][name] for b in batches])
+		return draws, results
+
+
+def evaluate_draws(task):
+	""" Computes one batch (monte_carlo, number, seed) of MonteCarlo.Run. """
+	monte_carlo, number, seed = task
+	return monte_carlo.Evaluate(number, seed)
+
+def quantiles(results, q=(0.05, 0.5, 0.95)):
+	""" Returns the statistics of the results of MonteCarlo.Run as a table
+	(list of rows, see save_table) : one row per result (one per line for
+	"split" and "line_max_load") with its "mean", its standard deviation "std"
+	and the given quantiles "q0.05", "q0.5"...
+
+	Draws with an infinite or undefined result are left out of the statistics
+	of this result and counted in "invalid".
+	"""
+	rows = []
+	for name in sorted(results.keys()):
+		values = results[name]
+		if values.ndim == 1:
+			columns = [(name, values)]
+		else:
+			columns = [("%s[%d]" % (name, j), values[:, j]) for j in range(values.shape[1])]
+		for column, v in columns:
+			valid = v[np.isfinite(v)]
+			row = {"result": column, "invalid": int(len(v) - len(valid))}
+			if len(valid) != 0:
+				row["mean"] = float(valid.mean())
+				row["std"] = float(valid.std())
+				for k, value in zip(q, np.percentile(valid, [100*k for k in q])):
+					row["q%g" % k] = float(value)
+			rows.append(row)
+	return rows
+
+def quantiles_columns(q=(0.05, 0.5, 0.95)):
+	""" Returns the columns of the table of quantiles. """
+	return ["result", "mean", "std"] + ["q%g" % k for k in q] + ["invalid"]
@@ -5,10 +5,30 @@
 
 import time
 import math
+import numpy as np
 
-class OD():
+from Logit import *
+from ODMatrix import *
+
+def matrix_attribute(name):
+	""" Returns a property which reads and writes the given attribute of the
+	OD in its ODMatrix.
+	"""
+	def get(self):
+		return float(getattr(self.matrix, name)[self.cell])
+	def set(self, value):
+		getattr(self.matrix, name)[self.cell] = float(value)
+		self.matrix.Touch(name != "demand")
+	return property(get, set)
+
+
+class OD(object):
 	""" Define a particular type of demand on a certain OD trip.
 	
+	The attributes of an OD are stored in an ODMatrix : the OD of a corridor
+	are views over the matrix of the corridor, an OD created alone has its own
+	1 x 1 matrix.
+	
 	Attributes:
 		- corridor -- Corridor
 		- origin (int) -- Origin
@@ -21,20 +41,35 @@ class OD():
 		- ve (float) -- Egress speed from arrival station to destination (km/h)
 	"""
 	
-	def __init__(self, corridor, origin, dest, demand, fd=1.0, fw=0.5, fe=1.0, va=5.0, ve=5.0):
+	__slots__ = ("corridor", "origin", "dest", "matrix", "cell")
+	
+	demand = matrix_attribute("demand")
+	fd = matrix_attribute("fd")
+	fw = matrix_attribute("fw")
+	fe = matrix_attribute("fe")
+	va = matrix_attribute("va")
+	ve = matrix_attribute("ve")
+	trip_length = matrix_attribute("trip_length")
+	
+	def __init__(self, corridor, origin, dest, demand=0, fd=1.0, fw=0.5, fe=1.0, va=5.0, ve=5.0, matrix=None):
 		self.corridor = corridor
 		self.origin = int(origin)
 		self.dest = int(dest)
-		self.demand = float(demand)
-		
-		self.fd = float(fd)
-		self.fw = float(fw)
-		self.fe = float(fe)
-		self.va = float(va)
-		self.ve = float(ve)
 		
-		self.trip_length = self.GetTripLength(self.origin, self.dest)
+		if matrix is None:
+			self.matrix = ODMatrix(1, demand, fd, fw, fe, va, ve)
+			self.cell = (0, 0)
+			self.trip_length = self.GetTripLength(self.origin, self.dest)
+		else:
+			# View over the cell (origin, dest) of the matrix of the corridor
+			self.matrix = matrix
+			self.cell = (self.origin, self.dest)
+	
+	def __getstate__(self):
+		return (self.corridor, self.origin, self.dest, self.matrix, self.cell)
 	
+	def __setstate__(self, state):
+		self.corridor, self.origin, self.dest, self.matrix, self.cell = state
 	
 	def Update(self):
 		""" Updates attributes that depend on corridor's attributes
@@ -113,23 +148,19 @@ class OD():
 		return self.fw/line.f
 		
 	def InVehicleTime(self, line):
-		""" Returns the in-vehicle time. """
-		
-		r = 0
+		""" Returns the in-vehicle time : half of the origin and destination
+		zones and the zones between them, a quarter of the zone for intra-zone
+		trips (read from the time table of the line, see Line.TimeTable).
+		"""
+		zone_time = line.ZoneTimes()
+		t = line.TimeTable()
 		a = min(self.origin, self.dest)
 		b = max(self.origin, self.dest)
 		
 		if a == b:
-			r += self.corridor.zone_length[a]/(4*line.GetCommercialSpeed(a))
-		else:
-			# Origin zone
-			r += self.corridor.zone_length[a]/(2*line.GetCommercialSpeed(a))
-			# Destination zone
-			r += self.corridor.zone_length[b]/(2*line.GetCommercialSpeed(b))
-			# Between them
-			for i in range(b - a - 1):
-				r += self.corridor.zone_length[a+i+1] / line.GetCommercialSpeed(a+i+1)
-		return r
+			return float(zone_time[a])/4
+		# Half of the origin and destination zones, whole zones between them
+		return float(zone_time[a]/2 + zone_time[b]/2 + (t[b] - t[a+1]))
 		
 	def TravelTime(self, line):
 		""" Returns the total travel time. """
@@ -167,33 +198,22 @@ class OD():
 		""" Computes the generalized cost for the demand on the given network. """
 		if self.demand == 0:
 			return 0
-		if len(lines) == 0:
-			return float("inf")
-		logsum = 0
-		for line in lines:
-			logsum += math.exp(-self.LineGeneralizedCost(param, line))
-		if logsum != 0:
-			logsum = math.log(logsum)
-		else:
-			logsum = -float("inf")
-		return -logsum
+		return self.LogSum(param, lines)
 	
+	def LogSum(self, param, lines):
+		""" Returns the logsum of the utilities of the given lines (see
+		Logit.log_sum_exp, which does not underflow).
+		"""
+		cost = np.array([self.LineGeneralizedCost(param, line) for line in lines], dtype=float)
+		return float(log_sum_exp(cost)[1])
 	
 	def ModalSplit(self, param, lines, line):
 		""" Compute the modal split of line given in argument in the set choice "lines". """
 		if self.demand != 0 and len(lines) != 0 :
-			v = self.LineGeneralizedCost(param, line)
-			
-			num = math.exp(-v)
-			denom = 0
-			for l in lines:
-				v = self.LineGeneralizedCost(param, l)
-				denom += math.exp(-v)
-			
-			if denom != 0:
-				return num / denom
-			else:
+			logsum = self.LogSum(param, lines)
+			if math.isinf(logsum):
 				return 0
+			return math.exp(logsum - self.LineGeneralizedCost(param, line))
 		else:
 			return 0
 	
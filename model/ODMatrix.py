@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ODMatrix.py
+
+import itertools
+import numpy as np
+
+# Revisions are unique among all matrices (see ODMatrix.Touch)
+revisions = itertools.count(1)
+
+class ODMatrix():
+	""" Demand and attributes of all the OD of a corridor, stored as n x n
+	arrays (rows are origins, columns are destinations).
+	
+	OD instances of a corridor are views over one cell of this matrix, so that
+	an OD is accessed in O(1) and copying a corridor only copies arrays.
+	
+	Attributes :
+		- n -- Number of zones
+		- demand, fd, fw, fe, va, ve, trip_length -- n x n arrays (see OD)
+		- origin, dest -- Origin and destination of each OD in the order of the
+			flattened arrays (origin-major, which is the order of Corridor.demand)
+		- revision -- Number which changes each time the matrix is modified
+		- attributes_revision -- Number which changes each time an attribute
+			other than the demand is modified
+	
+	The arrays can be read directly but they have to be modified through the OD
+	views, Corridor.SetDemand or Update, or Touch has to be called afterwards,
+	so that the results cached by the corridor are computed again.
+	"""
+	
+	ATTRIBUTES = ["demand", "fd", "fw", "fe", "va", "ve", "trip_length"]
+	
+	def __init__(self, n, demand=0.0, fd=1.0, fw=0.5, fe=1.0, va=5.0, ve=5.0):
+		self.n = n
+		self.demand = np.full((n, n), float(demand))
+		self.fd = np.full((n, n), float(fd))
+		self.fw = np.full((n, n), float(fw))
+		self.fe = np.full((n, n), float(fe))
+		self.va = np.full((n, n), float(va))
+		self.ve = np.full((n, n), float(ve))
+		self.trip_length = np.zeros((n, n))
+		
+		self.origin = np.repeat(np.arange(n), n)
+		self.dest = np.tile(np.arange(n), n)
+		self.Touch()
+	
+	def Touch(self, attributes=True):
+		""" Marks the matrix as modified (only the demand if attributes is False). """
+		self.revision = next(revisions)
+		if attributes:
+			self.attributes_revision = self.revision
+	
+	def Update(self, corridor):
+		""" Computes the default trip length of each OD (see OD.GetTripLength)
+		from the zones of the given corridor.
+		"""
+		landmarks = np.array(corridor.landmarks, dtype=float)
+		center = 0.5 * (landmarks[:-1] + landmarks[1:])
+		self.trip_length = np.abs(center[:, None] - center[None, :])
+		self.trip_length[np.diag_indices(self.n)] = np.array(corridor.zone_length, dtype=float) / 4.0
+		self.Touch()
+	
+	def Flat(self, attribute):
+		""" Returns a copy of the given attribute as a vector (in the order of
+		Corridor.demand).
+		"""
+		return getattr(self, attribute).flatten()
+	
+	def Copy(self):
+		""" Returns an identical matrix. """
+		m = ODMatrix(self.n)
+		for name in ODMatrix.ATTRIBUTES:
+			setattr(m, name, getattr(self, name).copy())
+		m.Touch()
+		return m
@@ -0,0 +1,284 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Objective.py
+
+import numpy as np
+
+from Corridor import *
+from Line import *
+from BatchObjective import *
+
+class Objective():
+	""" Objective function of an optimization scenario and its exact gradient.
+
+	The decision vector x contains the variables to optimize in their order of
+	appearance in the list "lines" : for each line, the frequency (if optimized)
+	and then the stop spacing of each optimized zone.
+
+	Attributes :
+		- param -- Parameters without crowding : the optimization ignores
+			crowding (see Equilibrium)
+		- equilibrium_param -- Parameters with crowding, used to compute the
+			equilibrium of the optimized corridor (see best_start)
+		- reference -- Reference corridor (used if demand is elastic)
+		- corridor -- Corridor with lines which won't be optimized
+		- lines -- List of lines to optimize
+		- elasticity -- True if demand is elastic
+		- variables -- (line index, zone) of each element of x (zone is -1 for frequency)
+		- scenario -- Corridor evaluated by the objective function. It is built
+			once and each evaluation only writes the decision vector into its lines
+			(and the elastic demand into its OD), see Bind.
+		- profiler -- Profiler which records the evaluations (None to disable profiling)
+		- last_value -- Value of the last evaluation of the objective function
+		- batch -- BatchObjective which evaluates many decision vectors at once
+			(built by ValuesAndGradients)
+	"""
+
+	def __init__(self, param, reference, corridor, lines, elasticity):
+		self.param = param.WithoutCrowding()
+		self.equilibrium_param = param
+		self.reference = reference
+		self.corridor = corridor
+		self.lines = lines
+		self.elasticity = elasticity
+		self.profiler = None
+		self.last_value = None
+
+		self.variables = []
+		for i in range(len(lines)):
+			if lines[i].opt[0] == 1:
+				self.variables.append((i, -1))
+			for j in range(corridor.n):
+				if lines[i].opt[1][j] == 1:
+					self.variables.append((i, j))
+
+		self.scenario = self.BuildCorridor(self.Variables()[0])
+		self.batch = None
+
+	def Variables(self):
+		""" Returns the initial decision vector and the bounds of each variable. """
+		x0 = []
+		bounds = []
+		for (i, j) in self.variables:
+			if j < 0:
+				x0.append(self.lines[i].f)
+				bounds.append(self.lines[i].cons[0])
+			else:
+				x0.append(self.lines[i].s[j])
+				bounds.append(self.lines[i].cons[1][j])
+		return x0, bounds
+
+	def StartingPoints(self, number, seed=None):
+		""" Returns number starting points for the optimization : the current
+		values of the variables, then points drawn inside the bounds by Latin
+		hypercube sampling (seed initializes the random generator).
+		"""
+		x0, bounds = self.Variables()
+		points = [np.array(x0, dtype=float)]
+		m = number - 1
+		if m > 0 and len(x0) > 0:
+			random = np.random.RandomState(seed)
+			low = np.array([b[0] for b in bounds], dtype=float)
+			high = np.array([b[1] for b in bounds], dtype=float)
+			# One point in each of the m strata of every variable
+			strata = np.argsort(random.rand(m, len(x0)), axis=0)
+			u = (strata + random.rand(m, len(x0))) / m
+			for x in low + u * (high - low):
+				points.append(x)
+		return points
+
+	def BuildCorridor(self, x, name=""):
+		""" Returns the corridor defined by the decision vector x.
+
+		Optimized lines come first in the list of lines, followed by the fixed ones.
+		"""
+		lines = self.lines
+		new_corridor = self.corridor.Duplicate(name)
+
+		c = 0 # A counter to identify the elements of x
+		for i in range(len(lines)):
+			# Frequency
+			if lines[i].opt[0] == 0:
+				f = lines[i].f
+			else:
+				f = x[c]
+				c += 1
+
+			# Stop spacing
+			s = []
+			for j in range(self.corridor.n):
+				if lines[i].opt[1][j] == 0:
+					s.append(lines[i].s[j])
+				else:
+					s.append(x[c])
+					c += 1
+
+			line = Line(new_corridor,
+						lines[i].m,
+						f,
+						s,
+						lines[i].v,
+						lines[i].k,
+						lines[i].dt,
+						lines[i].price,
+						lines[i].name,
+						lines[i].opt)
+			new_corridor.lines.append(line)
+
+		for l in self.corridor.lines:
+			new_corridor.lines.append(l.Duplicate())
+
+		if self.elasticity:
+			new_corridor.SetDemand(self.reference.ElasticDemand(self.param, new_corridor))
+
+		return new_corridor
+
+	def Bind(self, x):
+		""" Writes the decision vector x into the evaluation scenario and returns it. """
+		lines = self.scenario.lines
+		for c, (i, j) in enumerate(self.variables):
+			if j < 0:
+				lines[i].f = float(x[c])
+			else:
+				lines[i].s[j] = float(x[c])
+				lines[i].Touch()
+
+		if self.elasticity:
+			profiler = self.profiler
+			if profiler:
+				t = profiler.Clock()
+			self.scenario.SetDemand(self.reference.ElasticDemand(self.param, self.scenario))
+			if profiler:
+				profiler.Record("elastic_demand", t)
+				profiler.Count("modal_split", len(self.scenario.demand) * len(self.scenario.lines))
+
+		return self.scenario
+
+	def Value(self, x):
+		""" Returns the value of the objective function for the decision vector x. """
+		return self.ValueAndGradient(x, False)[0]
+
+	def Gradient(self, x):
+		""" Returns the gradient of the objective function for the decision vector x. """
+		return self.ValueAndGradient(x)[1]
+
+	def Values(self, X):
+		""" Returns the values of the objective function for the decision
+		vectors of the rows of X (see ValuesAndGradients).
+		"""
+		return self.ValuesAndGradients(X, False)[0]
+
+	def ValuesAndGradients(self, X, gradient=True):
+		""" Returns the values of the objective function (batch) and their
+		gradients (batch x variables, None if gradient is False) for the
+		decision vectors of the rows of X (batch x variables).
+
+		The decision vectors are evaluated together as arrays (see
+		BatchObjective), which is much faster than calling ValueAndGradient
+		for each of them (e.g. to compare many starting points or to sample
+		the objective).
+		"""
+		if self.batch == None:
+			self.batch = BatchObjective(self)
+		return self.batch.Evaluate(X, gradient)
+
+	def ValueAndGradient(self, x, gradient=True):
+		""" Returns the value of the objective function and its gradient with
+		respect to x (None if gradient is False).
+
+		The objective is the total cost (or the opposite of the total surplus if
+		demand is elastic) plus a malus if a line is too crowded (the square of
+		the excess of its maximum load over its capacity, see Logit.LinePeaks).
+		"""
+		param = self.param
+		profiler = self.profiler
+		if profiler:
+			t0 = profiler.Clock()
+		corridor = self.Bind(x)
+		if profiler:
+			t = profiler.Clock()
+		logit = corridor.GetLogit(param)
+		if profiler:
+			t = profiler.Record("logit", t)
+			profiler.Count("modal_split", logit.split.size)
+		demand = logit.demand
+		split = logit.split
+
+		# Capacity constraints are managed by giving a malus
+		# if the maximum load of a line is over its capacity.
+		peaks = logit.LineMaxLoads()
+		if profiler:
+			t = profiler.Record("load_scan", t)
+		excess = np.maximum(peaks - logit.capacity, 0)
+		malus = float((excess**2).sum())
+
+		if self.elasticity:
+			r = -self.reference.TotalSurplus(param, corridor) + malus
+		else:
+			r = logit.GeneralizedCost() + corridor.OperatorCost(param) - logit.TotalRevenues() + malus
+
+		self.last_value = r
+		if profiler:
+			profiler.Value(r)
+			t = profiler.Record("value", t)
+		if not gradient:
+			if profiler:
+				profiler.Record("objective", t0)
+			return r, None
+
+		with np.errstate(divide="ignore", invalid="ignore"):
+			# Derivative of the objective with respect to the utility of each
+			# line for each OD (OD x lines). With P the splits, the derivative of
+			# the logsum is P, the one of the split of line k is P_k*(P - delta_k).
+			price = np.where(logit.transit, logit.price, 0.0)
+			pbar = (split * price).sum(axis=1)
+			# Derivative of the malus with respect to the flow of each OD on
+			# each line (OD x lines) : the peak of a line grows with the load of
+			# a traveler at the abscisse of the peak
+			e = 2 * excess[None, :] * logit.PeakUnitLoads()
+			ebar = (split * e).sum(axis=1)
+
+			if self.elasticity:
+				# Elastic demand d = d0*(c + (1-c)*(gc0/gc)^gamma) depends on gc
+				demand0 = self.reference.od.Flat("demand")
+				gc0 = np.where(demand0 == 0, 0.0, self.reference.ReferenceCosts(param))
+				gc = logit.gc
+				valid = (demand0 != 0) & np.isfinite(gc0) & np.isfinite(gc) & (gc != 0)
+				ratio = np.where(valid, gc0 / np.where(valid, gc, 1), 0.0)
+				captive = param.captive
+				kappa = np.where(valid, -demand0 * (1 - captive) * param.gamma * ratio**param.gamma / np.where(valid, gc, 1), 0.0)
+
+				# The derivative of the malus with respect to the demand of each
+				# OD is ebar
+				d_demand = -0.5 * np.where(valid, gc0 - gc, 0.0) - pbar + ebar
+				base = d_demand * kappa + 0.5 * demand
+			else:
+				base = demand
+
+			w = split * (base[:, None] + demand[:, None] * (price[None, :] - pbar[:, None] + ebar[:, None] - e))
+			w = np.where(np.isfinite(w), w, 0.0)
+
+			# Chain rule through the closed forms of access, waiting, in-vehicle
+			# and egress times
+			grad = np.zeros(len(self.variables))
+			for c, (i, j) in enumerate(self.variables):
+				line = corridor.lines[i]
+				d_cost = line.OperatorCostGradient(param)
+				if j < 0:
+					if line.m != 0:
+						dv = -param.ctime * param.ww * logit.fw / line.f**2
+						grad[c] = (w[:, i] * dv).sum()
+					grad[c] += d_cost[0] - 2 * excess[i] * line.k
+				else:
+					if line.m != 0:
+						dv = param.wa * logit.fd / (2 * logit.va) * (logit.origin == j) + \
+							param.we * logit.fe / (2 * logit.ve) * (logit.dest == j) + \
+							param.wt * logit.zone_share[:, j] * line.ZoneTimeDerivative(j)
+						grad[c] = (w[:, i] * param.ctime * dv).sum()
+					grad[c] += d_cost[1][j]
+
+		if profiler:
+			profiler.Record("gradient", t)
+			profiler.Record("objective", t0)
+		return r, grad
@@ -3,10 +3,17 @@
 
 # Parameters.py
 
+import copy
 import model
 
 class Parameters():
 	""" This class contains all the parameters needed to compute the model. """
+	
+	# Numerical parameters (saved in study files and used to build keys)
+	ATTRIBUTES = ["vmax", "s", "f", "k", "dt", "alpha", "car_price", "price", 
+					"cexp", "cinf", "csta", "ctime", "wa", "ww", "wt", "we", 
+					"gamma", "captive", "crowding", "eq_tolerance", "eq_iterations"]
+	
 	def __init__(self):
 		# Modes paramaters
 		self.nb_modes = 6
@@ -49,11 +56,22 @@ class Parameters():
 		
 		self.captive = 0.3
 		
+		# Crowding : the in-vehicle time of a line of mode i is perceived
+		# (1 + crowding[i]*x^2) times longer where x is its load ratio (0 to
+		# ignore crowding, see Equilibrium)
+		self.crowding = [0, 0, 0, 0, 0, 0]
+		
+		# Equilibrium : largest change of a load ratio between two iterations
+		# and maximum number of iterations
+		self.eq_tolerance = 1e-6
+		self.eq_iterations = 100
+		
 	def Duplicate(self):
 		p = Parameters()
 		for i in range(self.nb_modes):
 			p.dt[i] = self.dt[i]
 			p.alpha[i] = self.alpha[i]
+			p.crowding[i] = self.crowding[i]
 		
 		p.ctime = self.ctime
 		
@@ -66,8 +84,31 @@ class Parameters():
 		
 		p.captive = self.captive
 		
+		p.eq_tolerance = self.eq_tolerance
+		p.eq_iterations = self.eq_iterations
+		
+		return p
+	
+	def Crowded(self):
+		""" Returns True if crowding is taken into account for at least one mode. """
+		return any([c != 0 for c in self.crowding])
+	
+	def WithoutCrowding(self):
+		""" Returns a copy of the parameters where crowding is ignored. """
+		p = copy.copy(self)
+		p.crowding = [0]*self.nb_modes
 		return p
 		
+	def Key(self):
+		""" Returns a tuple of the values of all numerical parameters. """
+		key = []
+		for name in Parameters.ATTRIBUTES:
+			value = getattr(self, name)
+			if isinstance(value, list):
+				value = tuple(value)
+			key.append(value)
+		return tuple(key)
+	
 	def DefaultLine(self, corridor, mode):
 		""" Returns a line with the default attributes for given mode and corridor. """
 		line = model.Line(corridor,
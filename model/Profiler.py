@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Profiler.py
+
+import time
+
+class Profiler():
+	""" Records call counts, timings and the iteration history of an optimization.
+
+	The objects which can be profiled (see Objective) keep a profiler attribute
+	which is None when profiling is disabled, so that a disabled profiler only
+	costs a test.
+
+	Attributes :
+		- counters -- {name : [number of calls, cumulative time in s]}
+		- history -- One dictionary per iteration of the optimizer : "iteration",
+			value "fun" at the end of the iteration, number of evaluations "nfev"
+			and elapsed time "time" since the creation of the profiler
+		- last -- Last value given to Value (value of the objective function)
+	"""
+
+	def __init__(self):
+		self.counters = {}
+		self.history = []
+		self.last = None
+		self.start = time.time()
+
+	def Clock(self):
+		""" Returns the current time (to give to Record). """
+		return time.time()
+
+	def Record(self, name, t0, calls=1):
+		""" Adds calls calls and the time elapsed since t0 to the counter name.
+
+		Returns the current time so that consecutive sections can be chained.
+		"""
+		t = time.time()
+		counter = self.counters.setdefault(name, [0, 0.0])
+		counter[0] += calls
+		counter[1] += t - t0
+		return t
+
+	def Count(self, name, calls=1):
+		""" Adds calls calls to the counter name without timing them. """
+		counter = self.counters.setdefault(name, [0, 0.0])
+		counter[0] += calls
+
+	def Value(self, value):
+		""" Stores the last value of the objective function (see Iteration). """
+		self.last = value
+
+	def Iteration(self, x=None):
+		""" Records the end of an iteration of the optimizer (it can be used as
+		the callback of scipy.optimize.minimize).
+		"""
+		nfev = self.counters.get("objective", [0, 0.0])[0]
+		self.history.append({"iteration": len(self.history) + 1,
+							"fun": self.last,
+							"nfev": nfev,
+							"time": time.time() - self.start})
+
+	def Stats(self):
+		""" Returns the recorded data as a dictionary which can be exported
+		(JSON) : "time" (total elapsed time), "counters" ({name : {"calls",
+		"time", "per_call"}}) and "history".
+		"""
+		return {"time": time.time() - self.start,
+				"counters": stats_counters(self.counters),
+				"history": list(self.history)}
+
+
+def stats_counters(counters):
+	""" Returns the counters {name : [calls, time]} as {name : {"calls",
+	"time", "per_call"}}.
+	"""
+	d = {}
+	for name, (calls, t) in counters.items():
+		if calls != 0:
+			per_call = t / calls
+		else:
+			per_call = 0.0
+		d[name] = {"calls": calls, "time": t, "per_call": per_call}
+	return d
+
+def merge_stats(stats):
+	""" Returns the sum of a list of Profiler.Stats. The histories of the runs
+	are put one after another, "run" gives the index of the run of each iteration.
+	"""
+	counters = {}
+	history = []
+	total = 0.0
+	for k, s in enumerate(stats):
+		total += s["time"]
+		for name, c in s["counters"].items():
+			counter = counters.setdefault(name, [0, 0.0])
+			counter[0] += c["calls"]
+			counter[1] += c["time"]
+		for h in s["history"]:
+			h = dict(h)
+			h["run"] = k
+			history.append(h)
+	return {"time": total, "counters": stats_counters(counters), "history": history}
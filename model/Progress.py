@@ -0,0 +1,45 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Progress.py
+
+class Progress():
+	""" Receives the progression of Model.Calculate.
+	
+	This implementation does nothing : the user interface and the batch runner
+	subclass it to display the progression.
+	"""
+	
+	def Start(self, total):
+		""" Called before the computation of total steps. """
+		pass
+	
+	def Update(self, count, total, name=""):
+		""" Called each time a step is over (count steps are over).
+		name is the name of the scenario that has just been computed.
+		"""
+		pass
+	
+	def Iteration(self, name, iteration, value):
+		""" Called after each iteration of the optimization of the scenario name
+		(value is the value of the objective function). It is not called when
+		scenarios are computed by worker processes.
+		"""
+		pass
+	
+	def Result(self, summary):
+		""" Called with the Summary of each scenario as soon as it is computed. """
+		pass
+	
+	def Cancelled(self, name=None):
+		""" Returns True to cancel the whole computation (if name is None) or
+		the computation of the scenario name.
+		
+		It is called between the scenarios and after each iteration of the
+		optimizations, possibly from another thread than the user interface.
+		"""
+		return False
+	
+	def Finish(self):
+		""" Called when the computation is over (even if it has failed). """
+		pass
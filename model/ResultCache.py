@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ResultCache.py
+
+import os
+import json
+import hashlib
+import cPickle as pickle
+from collections import OrderedDict
+
+from Storage import *
+
+# Errors raised by the unpickling of a truncated or corrupted result file
+LOAD_ERRORS = (EOFError, ValueError, TypeError, KeyError, IndexError, AttributeError,
+				ImportError, pickle.UnpicklingError)
+
+class ResultCache():
+	""" Bounded cache of the results of the scenarios computed by Model.Calculate.
+
+	Each scenario is identified by a fingerprint of everything its result
+	depends on (see simulation_key and optimization_key), so a scenario which
+	has not changed since the last computation is not computed again.
+	Results are stored pickled : a hit always returns a new copy of the result.
+
+	Attributes :
+		- size -- Maximum number of results kept (the least recently used
+			results are removed first)
+		- path -- Directory where the results are also saved (None to keep them
+			only in memory). Results found there are reused by the next sessions.
+		- results -- {key : pickled result} ordered from the least recently used
+		- hits, misses -- Number of results found and not found since the creation
+	"""
+
+	def __init__(self, size=64, path=None):
+		self.size = size
+		self.path = path
+		self.results = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		if path != None and not os.path.isdir(path):
+			os.makedirs(path)
+
+	def Get(self, key):
+		""" Returns the result stored with the given key or None. A result file
+		which can not be unpickled (e.g. truncated) is removed and is a miss.
+		"""
+		data = self.results.pop(key, None)
+		if data == None and self.path != None:
+			try:
+				f = open(self.File(key), "rb")
+				try:
+					data = f.read()
+				finally:
+					f.close()
+			except IOError:
+				data = None
+		if data == None:
+			self.misses += 1
+			return None
+		try:
+			result = pickle.loads(data)
+		except LOAD_ERRORS:
+			self.Remove(key)
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.results[key] = data
+		self.Trim()
+		return result
+
+	def Set(self, key, result):
+		""" Stores the result with the given key. """
+		data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+		self.results.pop(key, None)
+		self.results[key] = data
+		self.Trim()
+		if self.path != None:
+			save_file(self.File(key), lambda temporary: write_data(data, temporary))
+			self.TrimDisk()
+
+	def Clear(self):
+		""" Removes all the results (also from the disk). """
+		self.results = OrderedDict()
+		if self.path != None:
+			for name in self.Files():
+				os.remove(os.path.join(self.path, name))
+
+	def Remove(self, key):
+		""" Removes the file of the given key, if any. """
+		try:
+			os.remove(self.File(key))
+		except OSError:
+			pass
+
+	def File(self, key):
+		""" Returns the path of the file of the given key. """
+		return os.path.join(self.path, key + ".pkl")
+
+	def Files(self):
+		""" Returns the names of the result files of the cache directory. """
+		return [name for name in os.listdir(self.path) if name.endswith(".pkl")]
+
+	def Trim(self):
+		""" Removes the least recently used results kept in memory. """
+		while len(self.results) > self.size:
+			self.results.popitem(last=False)
+
+	def TrimDisk(self):
+		""" Removes the oldest result files of the cache directory. """
+		files = [os.path.join(self.path, name) for name in self.Files()]
+		if len(files) > self.size:
+			files.sort(key=os.path.getmtime)
+			for name in files[:len(files) - self.size]:
+				os.remove(name)
+
+
+def write_data(data, path):
+	""" Writes the string data in the file path. """
+	f = open(path, "wb")
+	try:
+		f.write(data)
+	finally:
+		f.close()
+
+def fingerprint(d):
+	""" Returns the hash of a dictionary of numbers, strings and lists. """
+	return hashlib.sha1(json.dumps(d, sort_keys=True)).hexdigest()
+
+def corridor_fingerprint(corridor, demand=True):
+	""" Returns the dictionary which identifies a corridor (geometry, OD and
+	lines). If demand is False, the levels of demand of the OD are left out.
+	"""
+	d = corridor_to_dict(corridor)
+	d["zone_length"] = list(corridor.zone_length)
+	if not demand:
+		for od in d["demand"]:
+			del od["demand"]
+	return d
+
+def simulation_key(param, reference, sim):
+	""" Returns the key of a simulation scenario [corridor, elasticity]. """
+	corridor, elasticity = sim[0], bool(sim[1])
+	d = {"kind": "simulation",
+		"param": param_to_dict(param),
+		"elasticity": elasticity}
+	if elasticity:
+		# The demand is computed from the demand of the reference
+		d["corridor"] = corridor_fingerprint(corridor, False)
+		d["reference"] = corridor_fingerprint(reference)
+	else:
+		d["corridor"] = corridor_fingerprint(corridor)
+	return fingerprint(d)
+
+def optimization_key(param, reference, opt, starts=1, seed=None):
+	""" Returns the key of an optimization scenario [corridor, lines, elasticity]
+	computed from the given number of starting points, or None if its result
+	can not be reused (random starting points without seed).
+	"""
+	if starts > 1 and seed == None:
+		return None
+	corridor, lines, elasticity = opt[0], opt[1], bool(opt[2])
+	d = {"kind": "optimization",
+		"param": param_to_dict(param),
+		"elasticity": elasticity,
+		"lines": [line_to_dict(l) for l in lines],
+		"starts": starts,
+		"seed": seed}
+	if elasticity:
+		d["corridor"] = corridor_fingerprint(corridor, False)
+		d["reference"] = corridor_fingerprint(reference)
+	else:
+		d["corridor"] = corridor_fingerprint(corridor)
+	return fingerprint(d)
@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ScenarioStream.py
+
+import os
+import json
+import collections
+from multiprocessing import Pool
+
+from Model import *
+from Storage import *
+
+class ScenarioStream():
+	""" Computes the scenarios of a scenario file one after the other and
+	appends their results to a results file as soon as they are computed.
+
+	Unlike Model.Calculate, the scenarios and their results are not kept in
+	memory : a scenario is read when a worker is ready to compute it, and only
+	window scenarios are computed or waiting to be written at the same time.
+
+	The scenario file contains one scenario per line (JSON) : a simulation
+	{"corridor": ..., "elasticity": ...} or an optimization {"corridor": ...,
+	"lines": [...], "elasticity": ...} (see load_study).
+	The results file contains one line per scenario (JSON), in the order of
+	the scenario file : its "index" (line of the scenario file, from 0), its
+	"kind" ("simulation" or "optimization") and its results (see
+	scenario_results) with the "success" and the "message" of the
+	optimization, or an "error" if the scenario could not be computed.
+
+	Attributes :
+		- param -- Parameters
+		- reference -- Reference corridor
+		- processes -- Number of worker processes (1 to compute the scenarios
+			in the current process)
+		- starts, seed -- Starting points of the optimizations (see
+			Objective.StartingPoints)
+		- window -- Maximum number of scenarios sent to the workers and not
+			written yet
+	"""
+
+	def __init__(self, param, reference, processes=1, starts=1, seed=None, window=None):
+		self.param = param
+		self.reference = reference
+		self.processes = processes
+		self.starts = starts
+		self.seed = seed
+		if window == None:
+			window = 2*processes
+		self.window = max(1, window)
+		# Computed once here rather than in each worker (see Model.Calculate)
+		self.reference.ReferenceCosts(self.param)
+
+	def Run(self, scenarios_path, results_path, resume=True, callback=None):
+		""" Computes the scenarios of scenarios_path and appends their results
+		to results_path.
+
+		If resume is True, the scenarios whose results are already in
+		results_path (e.g. written by an interrupted run) are not computed
+		again. callback is called with each row of results once it is written.
+		Returns the number of scenarios computed.
+		"""
+		done = 0
+		if resume:
+			done = completed_rows(results_path)
+		else:
+			open(results_path, "w").close()
+
+		out = open(results_path, "a")
+		try:
+			count = 0
+			for row in self.Rows(records(scenarios_path, done)):
+				out.write(json.dumps(row) + "\n")
+				# A row is on the disk as soon as its scenario is computed
+				out.flush()
+				os.fsync(out.fileno())
+				count += 1
+				if callback != None:
+					callback(row)
+		finally:
+			out.close()
+		return count
+
+	def Rows(self, tasks):
+		""" Returns an iterator over the results of the tasks (index, record)
+		(see compute_record), in their order.
+		"""
+		if self.processes <= 1:
+			for task in tasks:
+				yield compute_record((self, task[0], task[1]))
+			return
+
+		pool = Pool(self.processes)
+		try:
+			pending = collections.deque()
+			for task in tasks:
+				pending.append(pool.apply_async(compute_record, ((self, task[0], task[1]),)))
+				if len(pending) >= self.window:
+					yield pending.popleft().get()
+			while pending:
+				yield pending.popleft().get()
+		finally:
+			pool.terminate()
+			pool.join()
+
+	def __getstate__(self):
+		# Only the settings are sent to the workers
+		return (self.param, self.reference, self.starts, self.seed)
+
+	def __setstate__(self, state):
+		self.param, self.reference, self.starts, self.seed = state
+		self.processes = 1
+		self.window = 1
+
+
+def records(path, skip=0):
+	""" Returns an iterator over the scenarios (index, record) of a scenario
+	file (see ScenarioStream) from the line skip, read one at a time.
+	"""
+	f = open(path)
+	try:
+		index = 0
+		for line in f:
+			if not line.strip():
+				continue
+			if index >= skip:
+				yield index, line
+			index += 1
+	finally:
+		f.close()
+
+def completed_rows(path):
+	""" Returns the number of complete rows of a results file (see
+	ScenarioStream.Run) and removes an incomplete last row.
+	"""
+	if not os.path.exists(path):
+		return 0
+	f = open(path, "r+")
+	try:
+		count = 0
+		end = 0
+		for line in iter(f.readline, ""):
+			try:
+				json.loads(line)
+			except ValueError:
+				break
+			if not line.endswith("\n"):
+				break
+			count += 1
+			end += len(line)
+		f.truncate(end)
+	finally:
+		f.close()
+	return count
+
+def compute_record(task):
+	""" Computes the scenario of a line of a scenario file : task is
+	(stream, index, line). Returns the row of results (see ScenarioStream).
+	"""
+	stream, index, line = task
+	row = {"index": index}
+	try:
+		d = json.loads(line)
+		corridor = corridor_from_dict(d["corridor"])
+		elasticity = d.get("elasticity", False)
+		if "lines" in d:
+			row["kind"] = "optimization"
+			lines = [line_from_dict(l, corridor) for l in d["lines"]]
+			result = optimize_scenario(stream.param, stream.reference, [corridor, lines, elasticity],
+										stream.starts, stream.seed)
+			if result == None:
+				raise ValueError("no variable to optimize")
+			corridor = result[0]
+			row["success"] = bool(result[1][1])
+			row["message"] = str(result[1][2])
+		else:
+			row["kind"] = "simulation"
+			corridor = simulate_scenario(stream.param, stream.reference, [corridor, elasticity])
+		row.update(scenario_results(stream.param, stream.reference, corridor))
+	except Exception as e:
+		row["error"] = "%s : %s" % (e.__class__.__name__, e)
+	return row
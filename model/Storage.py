@@ -0,0 +1,377 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Storage.py
+
+import os
+import csv
+import json
+import zipfile
+import tempfile
+import hashlib
+import StringIO
+import numpy as np
+
+from Corridor import *
+from LazyResults import *
+from Line import *
+from Parameters import *
+from Summary import *
+
+# Version of the study archives written by save_study (study files written
+# as a single JSON file are version 1)
+STUDY_VERSION = 2
+
+# Attributes of the OD stored in a study archive (trip lengths are computed)
+OD_ATTRIBUTES = ["demand", "fd", "fw", "fe", "va", "ve"]
+
+
+def to_str(value):
+	""" Returns value as an utf-8 encoded string (json returns unicode). """
+	if isinstance(value, unicode):
+		return value.encode("utf-8")
+	return value
+
+def param_to_dict(param):
+	""" Returns the parameters as a dictionary. """
+	d = {}
+	for name in Parameters.ATTRIBUTES:
+		d[name] = getattr(param, name)
+	return d
+
+def param_from_dict(d):
+	""" Returns the Parameters defined by the dictionary d
+	(missing values keep their default value).
+	"""
+	param = Parameters()
+	for name in Parameters.ATTRIBUTES:
+		if name in d:
+			setattr(param, name, d[name])
+	return param
+
+def line_to_dict(line):
+	""" Returns the line as a dictionary. """
+	return {"name": line.name,
+			"mode": line.m,
+			"f": line.f,
+			"s": list(line.s),
+			"v": list(line.v),
+			"k": line.k,
+			"dt": line.dt,
+			"price": line.price,
+			"opt": line.opt,
+			"cons": line.cons}
+
+def line_from_dict(d, corridor):
+	""" Returns the line of the given corridor defined by the dictionary d. """
+	return Line(corridor,
+				d["mode"],
+				d["f"],
+				list(d["s"]),
+				list(d["v"]),
+				d["k"],
+				d["dt"],
+				d["price"],
+				to_str(d.get("name", "")),
+				d.get("opt", 0),
+				d.get("cons", 0))
+
+def corridor_to_dict(corridor):
+	""" Returns the corridor (geometry, OD and lines) as a dictionary. The
+	zones of a corridor of typology Corridor.CUSTOM are given by "zone_length".
+	"""
+	demand = []
+	for od in corridor.demand:
+		demand.append({"origin": od.origin, "dest": od.dest, "demand": od.demand,
+						"fd": od.fd, "fw": od.fw, "fe": od.fe, "va": od.va, "ve": od.ve})
+	lines = []
+	for line in corridor.lines:
+		lines.append(line_to_dict(line))
+	d = {"name": corridor.name,
+		"length": corridor.length,
+		"typo": corridor.typo,
+		"demand": demand,
+		"lines": lines}
+	if corridor.typo == Corridor.CUSTOM:
+		d["zone_length"] = list(corridor.zone_length)
+	return d
+
+def corridor_geometry(d):
+	""" Returns the corridor without OD nor lines defined by the dictionary d
+	(see corridor_to_dict). Zones can be given by "zone_length" or by
+	"landmarks" (see Corridor.SetZones).
+	"""
+	corridor = Corridor(to_str(d["name"]), d.get("length", 0), d.get("typo", Corridor.CUSTOM))
+	if "zone_length" in d or "landmarks" in d:
+		corridor.SetZones(d.get("zone_length"), d.get("landmarks"))
+	return corridor
+
+def corridor_from_dict(d):
+	""" Returns the corridor defined by the dictionary d. """
+	corridor = corridor_geometry(d)
+	defaults = {"fd": 1.0, "fw": 0.5, "fe": 1.0, "va": 5.0, "ve": 5.0, "demand": 0.0}
+	for od in d.get("demand", []):
+		for name in defaults:
+			getattr(corridor.od, name)[od["origin"], od["dest"]] = od.get(name, defaults[name])
+	corridor.od.Touch()
+	for line in d.get("lines", []):
+		corridor.lines.append(line_from_dict(line, corridor))
+	return corridor
+
+def load_study(path, model):
+	""" Loads the parameters, the reference and the scenarios of a study file
+	into model.
+	
+	The study file is either a study archive (see save_study), whose results
+	are loaded too, or a JSON file (version 1) which contains a dictionary
+	with the keys "param", "reference", "simulations" ([{"corridor": ...,
+	"elasticity": ...}, ...]) and "optimizations" ([{"corridor": ...,
+	"lines": [...], "elasticity": ...}, ...]).
+	"""
+	if zipfile.is_zipfile(path):
+		load_archive(path, model)
+		return
+	
+	f = open(path)
+	try:
+		d = json.load(f)
+	finally:
+		f.close()
+	if d.get("version", 1) != 1:
+		raise ValueError("unsupported study file version : %s" % d["version"])
+	
+	model.param = param_from_dict(d.get("param", {}))
+	model.reference = corridor_from_dict(d["reference"])
+	model.length = model.reference.length
+	model.typo = model.reference.typo
+	model.simulations = []
+	for sim in d.get("simulations", []):
+		model.simulations.append([corridor_from_dict(sim["corridor"]), sim.get("elasticity", False)])
+	model.optimizations = []
+	for opt in d.get("optimizations", []):
+		corridor = corridor_from_dict(opt["corridor"])
+		lines = []
+		for line in opt.get("lines", []):
+			lines.append(line_from_dict(line, corridor))
+		model.optimizations.append([corridor, lines, opt.get("elasticity", False)])
+	model.optimizations_results = []
+	model.simulations_results = []
+	model.summaries = []
+	model.results_success = []
+	model.optimizations_starts = []
+	model.optimizations_profiles = []
+
+def save_file(path, write):
+	""" Writes the file path with the function write, which is given the path
+	of a temporary file in the same directory : the temporary file replaces
+	path only once it is written, so that an error does not leave a
+	truncated file (or the previous one) at path.
+	"""
+	fd, temporary = tempfile.mkstemp(".tmp", "", os.path.dirname(os.path.abspath(path)))
+	os.close(fd)
+	try:
+		write(temporary)
+		# A file can not be renamed over another one on Windows
+		if os.name == "nt" and os.path.exists(path):
+			os.remove(path)
+		os.rename(temporary, path)
+	except:
+		os.remove(temporary)
+		raise
+
+def save_study(model, path, results=True):
+	""" Saves the parameters, the reference, the scenarios and, if results is
+	True, the results of the last computation of model in a study archive.
+	
+	A study archive is a zip file : "study.json" is its index and contains
+	the version of the format (STUDY_VERSION), the parameters, the corridors
+	(see corridor_to_index), the lines to optimize and the results, i.e. the
+	summaries of the scenarios (see Summary.ToDict), the diagnostics of the
+	optimizations and the result corridors. The OD attributes of the
+	corridors are stored as arrays (.npz, see save_od) which are shared by
+	corridors with the same OD and only read when a corridor is loaded :
+	result corridors are read when they are accessed (see LazyResults).
+	
+	The archive is written in a temporary file (see save_file) : results
+	which are not loaded yet can be read from path while it is saved.
+	"""
+	save_file(path, lambda temporary: write_study(model, temporary, results))
+
+def write_study(model, path, results):
+	""" Writes the study archive of model at path (see save_study). """
+	archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+	try:
+		d = {"version": STUDY_VERSION,
+			"param": param_to_dict(model.param),
+			"reference": corridor_to_index(model.reference, archive),
+			"simulations": [],
+			"optimizations": []}
+		for sim in model.simulations:
+			d["simulations"].append({"corridor": corridor_to_index(sim[0], archive),
+									"elasticity": bool(sim[1])})
+		for opt in model.optimizations:
+			d["optimizations"].append({"corridor": corridor_to_index(opt[0], archive),
+										"lines": [line_to_dict(l) for l in opt[1]],
+										"elasticity": bool(opt[2])})
+		if results:
+			r = {"simulations": [], "optimizations": []}
+			for corridor in model.simulations_results:
+				r["simulations"].append(corridor_to_index(corridor, archive))
+			for corridor in model.optimizations_results:
+				r["optimizations"].append(corridor_to_index(corridor, archive))
+			r["summaries"] = [summary.ToDict() for summary in model.summaries]
+			r["success"] = [[name, bool(success), str(message)] for name, success, message in model.results_success]
+			r["starts"] = model.optimizations_starts
+			r["profiles"] = model.optimizations_profiles
+			d["results"] = r
+		archive.writestr("study.json", json.dumps(d))
+	finally:
+		archive.close()
+
+def load_archive(path, model):
+	""" Loads a study archive (see save_study) into model. The result
+	corridors are read when they are accessed (see LazyResults).
+	"""
+	archive = zipfile.ZipFile(path)
+	try:
+		d = json.loads(archive.read("study.json"))
+		if d.get("version") > STUDY_VERSION:
+			raise ValueError("unsupported study file version : %s" % d.get("version"))
+		
+		model.param = param_from_dict(d.get("param", {}))
+		model.reference = corridor_from_index(d["reference"], archive)
+		model.length = model.reference.length
+		model.typo = model.reference.typo
+		model.simulations = []
+		for sim in d.get("simulations", []):
+			model.simulations.append([corridor_from_index(sim["corridor"], archive), sim.get("elasticity", False)])
+		model.optimizations = []
+		for opt in d.get("optimizations", []):
+			corridor = corridor_from_index(opt["corridor"], archive)
+			lines = []
+			for line in opt.get("lines", []):
+				lines.append(line_from_dict(line, corridor))
+			model.optimizations.append([corridor, lines, opt.get("elasticity", False)])
+	finally:
+		archive.close()
+	
+	r = d.get("results", {})
+	load = lambda index: load_corridor(path, index)
+	model.simulations_results = LazyResults(r.get("simulations", []), load)
+	model.optimizations_results = LazyResults(r.get("optimizations", []), load)
+	model.summaries = [summary_from_dict(s) for s in r.get("summaries", [])]
+	model.results_success = [[to_str(name), success, to_str(message)] for name, success, message in r.get("success", [])]
+	model.optimizations_starts = r.get("starts", [])
+	model.optimizations_profiles = r.get("profiles", [])
+
+def load_corridor(path, index):
+	""" Returns the corridor of the study archive path given by index (see
+	corridor_to_index).
+	"""
+	archive = zipfile.ZipFile(path)
+	try:
+		return corridor_from_index(index, archive)
+	finally:
+		archive.close()
+
+def corridor_to_index(corridor, archive):
+	""" Returns the corridor as a dictionary (see corridor_to_dict) whose OD
+	are given by the name "od" of their arrays in the study archive (see
+	save_od).
+	"""
+	d = corridor_to_dict(corridor)
+	del d["demand"]
+	d["od"] = save_od(corridor.od, archive)
+	return d
+
+def corridor_from_index(d, archive):
+	""" Returns the corridor given by corridor_to_index. """
+	corridor = corridor_geometry(d)
+	arrays = np.load(StringIO.StringIO(archive.read(d["od"])))
+	for name in OD_ATTRIBUTES:
+		getattr(corridor.od, name)[:] = arrays[name]
+	corridor.od.Touch()
+	for line in d.get("lines", []):
+		corridor.lines.append(line_from_dict(line, corridor))
+	return corridor
+
+def save_od(od, archive):
+	""" Writes the attributes of the ODMatrix od in the study archive (once for
+	identical matrices) and returns the name of the entry.
+	"""
+	data = hashlib.sha1()
+	for name in OD_ATTRIBUTES:
+		data.update(np.ascontiguousarray(getattr(od, name), dtype=float).tostring())
+	name = "od/%s.npz" % data.hexdigest()
+	if not name in archive.namelist():
+		f = StringIO.StringIO()
+		np.savez_compressed(f, **dict([(a, getattr(od, a)) for a in OD_ATTRIBUTES]))
+		archive.writestr(zipfile.ZipInfo(name), f.getvalue())
+	return name
+
+def summary_from_dict(d):
+	""" Returns the Summary given as a dictionary by Summary.ToDict. """
+	summary = Summary(None, None, None)
+	for name, value in d.items():
+		setattr(summary, str(name), value)
+	summary.name = to_str(d["name"])
+	summary.lines = []
+	for line in d["lines"]:
+		summary.lines.append(dict([(str(k), to_str(v)) for k, v in line.items()]))
+	summary.operator_cost = sum([line["operator_cost"] for line in summary.lines])
+	return summary
+
+def scenario_results(param, reference, corridor, summary=None):
+	""" Returns the main indicators of a computed scenario as a dictionary
+	(see Summary, which is computed if it is not given).
+	"""
+	if summary == None:
+		summary = Summary(param, reference, corridor)
+	d = summary.ToDict()
+	for j, line in enumerate(corridor.lines):
+		d["lines"][j].update(line_to_dict(line))
+	return d
+
+def save_results(model, path):
+	""" Saves the results of the last computation of model (JSON). """
+	results = [model.reference] + list(model.simulations_results) + list(model.optimizations_results)
+	summaries = model.summaries
+	if len(summaries) != len(results):
+		summaries = [None]*len(results)
+	d = {"reference": scenario_results(model.param, model.reference, model.reference, summaries[0]),
+		"simulations": [],
+		"optimizations": []}
+	k = 1
+	for r in model.simulations_results:
+		d["simulations"].append(scenario_results(model.param, model.reference, r, summaries[k]))
+		k += 1
+	for i, r in enumerate(model.optimizations_results):
+		d["optimizations"].append(scenario_results(model.param, model.reference, r, summaries[k]))
+		k += 1
+		if i < len(model.optimizations_starts):
+			d["optimizations"][-1]["starts"] = model.optimizations_starts[i]
+		if i < len(model.optimizations_profiles):
+			d["optimizations"][-1]["profile"] = model.optimizations_profiles[i]
+	d["optimizations_success"] = [[name, bool(success), str(message)] for name, success, message in model.results_success]
+	save_file(path, lambda temporary: write_json(d, temporary))
+
+def write_json(d, path):
+	""" Writes d in the JSON file path. """
+	f = open(path, "w")
+	try:
+		json.dump(d, f, indent=1)
+	finally:
+		f.close()
+
+def save_table(columns, rows, path):
+	""" Saves a table (list of rows {column : value}, see Sweep.Evaluate) in a
+	CSV file with the given columns.
+	"""
+	f = open(path, "wb")
+	try:
+		writer = csv.DictWriter(f, columns, extrasaction="ignore")
+		writer.writeheader()
+		for row in rows:
+			writer.writerow(row)
+	finally:
+		f.close()
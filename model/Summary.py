@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Summary.py
+
+class Summary():
+	""" Main indicators of a computed scenario, computed once (see
+	Model.Calculate) so that the user interface and the exports only read them.
+
+	Attributes :
+		- name -- Name of the scenario
+		- total_demand -- Total level of demand
+		- avg_travel_time -- Average travel time (h)
+		- generalized_cost -- Total generalized cost
+		- infra_cost, operating_cost, operator_cost -- Costs of all the lines
+		- total_cost -- Total cost (travelers + operators - revenues)
+		- total_surplus -- Total surplus with respect to the reference
+		- max_load -- Maximum load of the corridor (both directions)
+		- equilibrium -- Convergence diagnostics of the equilibrium with
+			crowding (see Equilibrium.Solve), None without crowding
+		- lines -- One dictionary of indicators per line : "name", "f", "s",
+			"demand", "split", "max_load" (maximum load of the line, see
+			Logit.LinePeaks), "load_ratio" (max_load/capacity), "commercial_speed",
+			"vehicles", "infra_cost", "operating_cost", "operator_cost" and "revenues"
+	"""
+
+	def __init__(self, param, reference, corridor):
+		self.equilibrium = None
+		if corridor == None:
+			# Empty summary (see Storage.summary_from_dict)
+			return
+		logit = corridor.GetLogit(param)
+		if logit.equilibrium != None:
+			self.equilibrium = dict(logit.equilibrium)
+		line_demand = logit.LineDemand()
+		revenues = logit.LineRevenues()
+		line_max_load = logit.LineMaxLoads()
+		load_ratio = logit.LoadRatios()
+
+		self.name = corridor.name
+		self.total_demand = corridor.TotalDemand()
+		self.avg_travel_time = logit.AvgTravelTime()
+		self.generalized_cost = logit.GeneralizedCost()
+		self.max_load = max(corridor.MaxLoadA(), corridor.MaxLoadB())
+
+		self.lines = []
+		self.infra_cost = 0
+		self.operating_cost = 0
+		self.operator_cost = 0
+		for j, line in enumerate(corridor.lines):
+			d = {"name": line.name, "f": line.f, "s": list(line.s)}
+			d["demand"] = float(line_demand[j])
+			if self.total_demand != 0:
+				d["split"] = float(line_demand[j] / self.total_demand)
+			else:
+				d["split"] = 0.0
+			d["max_load"] = float(line_max_load[j])
+			d["load_ratio"] = float(load_ratio[j])
+			d["commercial_speed"] = line.GetCommercialSpeed()
+			d["vehicles"] = line.VehiclesNumber()
+			d["infra_cost"] = line.InfraCost(param)
+			d["operating_cost"] = line.OperatingCost(param)
+			d["operator_cost"] = d["infra_cost"] + d["operating_cost"]
+			d["revenues"] = float(revenues[j])
+			self.infra_cost += d["infra_cost"]
+			self.operating_cost += d["operating_cost"]
+			self.operator_cost += d["operator_cost"]
+			self.lines.append(d)
+
+		self.total_cost = self.generalized_cost + self.operator_cost - logit.TotalRevenues()
+		self.total_surplus = reference.TotalSurplus(param, corridor)
+
+	def AvgGeneralizedCost(self):
+		""" Returns the average generalized cost of a traveler (0 if there is no demand). """
+		if self.total_demand != 0:
+			return self.generalized_cost / self.total_demand
+		return 0
+
+	def ToDict(self):
+		""" Returns the indicators as a dictionary (see Storage.scenario_results). """
+		d = {"name": self.name,
+				"total_demand": self.total_demand,
+				"avg_travel_time": self.avg_travel_time,
+				"generalized_cost": self.generalized_cost,
+				"infra_cost": self.infra_cost,
+				"operating_cost": self.operating_cost,
+				"total_cost": self.total_cost,
+				"total_surplus": self.total_surplus,
+				"max_load": self.max_load,
+				"lines": [dict(l) for l in self.lines]}
+		if self.equilibrium != None:
+			d["equilibrium"] = dict(self.equilibrium)
+		return d
+
@@ -0,0 +1,288 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Sweep.py
+
+import re
+import itertools
+import numpy as np
+
+from Logit import *
+from LoadProfile import *
+from Parameters import *
+
+class Sweep():
+	""" Evaluates a simulation scenario for many sets of parameters at once.
+
+	The time components of the logit model, the vehicles and the stations of
+	the lines do not depend on the parameters : they are computed once, and the
+	utilities, splits, elastic demand and costs of all the sets of parameters
+	are computed as arrays with one more axis (points x OD x lines). Crowding
+	is not taken into account (see Equilibrium).
+
+	A point is a dictionary {parameter : value} which gives the parameters that
+	differ from param. A parameter is the name of a numerical parameter which
+	does not change the lines (see Sweep.PARAMETERS) followed by the mode for
+	the parameters given for each mode, e.g. {"ctime": 10, "alpha[3]": 0.5}
+	(see parameter_grid).
+	"demand" is a factor applied to the demand of every OD (of the reference if
+	demand is elastic), "demand[i]" to the demand of the OD i (in the order of
+	corridor.demand).
+
+	Attributes :
+		- param -- Parameters which give the values that are not swept
+		- reference -- Reference corridor
+		- corridor -- Corridor of the simulation scenario
+		- elasticity -- True if demand is elastic
+		- chunk -- Maximum number of elements (points x OD x lines) of the
+			arrays computed at once
+	"""
+
+	# Parameters which can be swept : the other ones (speed, capacity,
+	# frequency... of the default lines, crowding) do not change the time
+	# components computed once
+	PARAMETERS = ["ctime", "wa", "ww", "wt", "we", "alpha", "car_price", 
+				"cexp", "cinf", "csta", "gamma", "captive", "demand"]
+
+	# Results of each point (see Evaluate)
+	RESULTS = ["total_demand", "generalized_cost", "operator_cost", "revenues",
+				"total_cost", "total_surplus", "max_load"]
+
+	def __init__(self, param, reference, sim, chunk=1000000):
+		self.param = param
+		self.reference = reference
+		self.corridor = sim[0]
+		self.elasticity = bool(sim[1])
+		self.chunk = chunk
+		corridor = self.corridor
+
+		# Parts of the logit models which do not depend on the parameters
+		self.logit = Logit(corridor, param)
+		self.reference_logit = Logit(reference, param)
+		if self.elasticity:
+			self.elastic_logit = Logit(reference, param, corridor.lines)
+
+		# Load profiles of one traveler of each OD
+		self.unit_loads = corridor.UnitLoads()
+
+		# Operator cost of each line : cexp*vehicles + cinf*infra + csta*stations
+		lines = corridor.lines
+		self.vehicles = np.array([l.VehiclesNumber() for l in lines], dtype=float)
+		self.infra = np.where(self.logit.transit, self.vehicles, 1.0)
+		self.stations = np.zeros(len(lines))
+		for j, l in enumerate(lines):
+			if l.m != 0:
+				for i in range(corridor.n):
+					if l.s[i] < corridor.zone_length[i]:
+						self.stations[j] += corridor.zone_length[i]/l.s[i]
+
+	def Columns(self, points):
+		""" Returns the names of the columns of the table of results of the given points. """
+		keys = set()
+		for point in points:
+			keys.update(point.keys())
+		columns = ["point"] + sorted(keys) + Sweep.RESULTS
+		for j in range(len(self.corridor.lines)):
+			columns += ["split[%d]" % j, "line_max_load[%d]" % j]
+		return columns
+
+	def Arrays(self, points):
+		""" Returns the numerical parameters of the given points as arrays
+		{name : array} with one row per point (see Fill).
+		"""
+		return self.Fill(len(points), self.PointColumns(points))
+
+	def PointColumns(self, points):
+		""" Returns the values of the parameters of the given points as columns
+		{parameter : (mask, values)} (see Fill).
+		"""
+		columns = {}
+		for p, point in enumerate(points):
+			for key, value in point.items():
+				if not key in columns:
+					columns[key] = (np.zeros(len(points), dtype=bool), np.zeros(len(points)))
+				columns[key][0][p] = True
+				columns[key][1][p] = value
+		return columns
+
+	def Fill(self, nb, columns):
+		""" Returns the numerical parameters of nb points as arrays {name : array}
+		with one row per point. columns gives the values of the swept parameters :
+		{parameter : values} or {parameter : (mask, values)} if only the
+		points of the mask have a value. A parameter given for each mode without
+		mode takes the same value for all modes (before the values given for one
+		mode). "demand" is the factor applied to the demand of each OD
+		(points x OD) : factors given for all OD and for one OD are multiplied.
+		"""
+		arrays = {}
+		for name in Sweep.PARAMETERS[:-1]:
+			value = np.array(getattr(self.param, name), dtype=float)
+			arrays[name] = np.tile(value, (nb,) + (1,)*value.ndim)
+		arrays["demand"] = np.ones((nb, len(self.logit.demand)))
+		# Parameters given for all modes first, then the ones of each mode
+		keys = sorted(columns.keys(), key=lambda k: parse_parameter(k)[1] != None)
+		for key in keys:
+			values = columns[key]
+			if isinstance(values, tuple):
+				mask, values = values
+			else:
+				mask = slice(None)
+			values = np.asarray(values, dtype=float)
+			name, index = parse_parameter(key)
+			if name == "demand" and index == None:
+				arrays[name][mask] *= values[mask][:, None]
+			elif name == "demand":
+				arrays[name][mask, index] *= values[mask]
+			elif index == None and arrays[name].ndim == 2:
+				arrays[name][mask] = values[mask][:, None]
+			elif index == None:
+				arrays[name][mask] = values[mask]
+			else:
+				arrays[name][mask, index] = values[mask]
+		return arrays
+
+	def Evaluate(self, points):
+		""" Returns the table of results of the given points : a list of rows
+		{column : value} (see Columns), one row per point.
+
+		The results are the ones of the simulated corridor (see Model.Simulate)
+		with the parameters of the point : total demand, generalized cost,
+		operator cost, revenues, total cost, total surplus (with respect to the
+		reference), maximum load, and the split and maximum load of each line.
+		"""
+		results = self.EvaluateColumns(len(points), self.PointColumns(points))
+		rows = []
+		for p, point in enumerate(points):
+			row = {"point": p}
+			row.update(point)
+			for name, values in results.items():
+				if values.ndim == 1:
+					row[name] = float(values[p])
+				else:
+					for j in range(values.shape[1]):
+						row["%s[%d]" % (name, j)] = float(values[p, j])
+			rows.append(row)
+		return rows
+
+	def EvaluateColumns(self, nb, columns):
+		""" Returns the results of nb points whose parameters are given as
+		columns (see Fill), computed in chunks of self.chunk elements
+		(see EvaluateArrays).
+		"""
+		size = max(1, self.chunk // max(1, self.logit.cost.size))
+		chunks = []
+		for start in range(0, nb, size):
+			part = {}
+			for key, values in columns.items():
+				if isinstance(values, tuple):
+					part[key] = (values[0][start:start + size], values[1][start:start + size])
+				else:
+					part[key] = np.asarray(values)[start:start + size]
+			chunks.append(self.EvaluateArrays(self.Fill(min(size, nb - start), part)))
+		results = {}
+		for name in chunks[0] if chunks else []:
+			results[name] = np.concatenate([c[name] for c in chunks])
+		return results
+
+	def EvaluateArrays(self, a):
+		""" Returns the results of the parameters given as arrays (see Arrays) :
+		{name : array} with one row per point (and one column per line for
+		"split" and "line_max_load").
+		"""
+		nb = len(a["ctime"])
+		logit = self.logit
+
+		# Generalized cost of each OD with the lines of the reference
+		gc0 = log_sum_exp(batched_costs(self.reference_logit, a))[1]
+
+		# Demand of each OD for each point
+		if self.elasticity:
+			d0 = self.reference_logit.demand * a["demand"]
+			gc0_e = np.where(d0 == 0, 0.0, gc0)
+			gc_e = np.where(d0 == 0, 0.0, log_sum_exp(batched_costs(self.elastic_logit, a))[1])
+			d = elastic_demand(d0, gc0_e, gc_e, a["captive"][:, None], a["gamma"][:, None])
+		else:
+			d = logit.demand * a["demand"]
+
+		# Logit model of the scenario
+		split, logsum = log_sum_exp(batched_costs(logit, a), d)
+		gc = np.where(d == 0, 0.0, logsum)
+		with np.errstate(invalid="ignore"):
+			generalized_cost = np.where(d == 0, 0.0, d * gc).sum(axis=1)
+		line_demand = (d[:, :, None] * split).sum(axis=1)
+		revenues = np.where(logit.transit, line_demand * logit.price, 0.0).sum(axis=1)
+		mode = logit.mode
+		operator_cost = (a["cexp"][:, mode] * self.vehicles + a["cinf"][:, mode] * self.infra +
+						a["csta"][:, mode] * self.stations).sum(axis=1)
+
+		# Consumer surplus (infinite if an OD has an infinite cost, see
+		# Corridor.GetConsumerSurplus)
+		gc0 = np.where(d == 0, 0.0, gc0)
+		infinite = np.isinf(gc) | np.isinf(gc0)
+		first = np.argmax(infinite, axis=1)
+		surplus = np.where(infinite, 0.0, d * 0.5 * (gc0 - gc)).sum(axis=1)
+		surplus = np.where(infinite.any(axis=1),
+							np.where(np.isinf(gc[np.arange(nb), first]), -float("inf"), float("inf")),
+							surplus)
+
+		# Loads
+		total_demand = d.sum(axis=1)
+		max_load = np.zeros(nb)
+		line_max_load = np.zeros((nb, len(mode)))
+		flows = d[:, :, None] * split
+		for u in self.unit_loads:
+			coef = np.tensordot(d, u, axes=1)
+			max_load = np.maximum(max_load, batched_max(self.corridor.landmarks, coef))
+			# Profiles of each line of each point (see Logit.LinePeaks)
+			coef = np.tensordot(flows.transpose(0, 2, 1), u, axes=1)
+			peaks = batched_max(self.corridor.landmarks, np.reshape(coef, (-1,) + u.shape[1:]))
+			line_max_load = np.maximum(line_max_load, np.reshape(peaks, line_max_load.shape))
+		with np.errstate(divide="ignore", invalid="ignore"):
+			line_split = np.where(total_demand[:, None] != 0, line_demand / total_demand[:, None], 0.0)
+
+		return {"total_demand": total_demand,
+				"generalized_cost": generalized_cost,
+				"operator_cost": operator_cost,
+				"revenues": revenues,
+				"total_cost": generalized_cost + operator_cost - revenues,
+				"total_surplus": surplus + revenues - operator_cost,
+				"max_load": max_load,
+				"split": line_split,
+				"line_max_load": line_max_load}
+
+
+def parse_parameter(key):
+	""" Returns (name, index) of a swept parameter given as "name" (index is
+	then None) or "name[index]" (index is a mode, or an OD for "demand").
+
+	Raises ValueError if the parameter can not be swept (see Sweep.PARAMETERS).
+	"""
+	match = re.match(r"^(\w+)(?:\[(\d+)\])?$", key)
+	if match == None or not match.group(1) in Parameters.ATTRIBUTES + ["demand"]:
+		raise ValueError("unknown parameter : %s" % key)
+	if not match.group(1) in Sweep.PARAMETERS:
+		raise ValueError("parameter which can not be swept : %s" % key)
+	if match.group(2) == None:
+		return match.group(1), None
+	return match.group(1), int(match.group(2))
+
+def parameter_grid(values):
+	""" Returns the points of the grid defined by values {parameter : list of
+	values} (see Sweep) : all the combinations of the values.
+	"""
+	keys = sorted(values.keys())
+	points = []
+	for combination in itertools.product(*[values[k] for k in keys]):
+		points.append(dict(zip(keys, combination)))
+	return points
+
+def batched_costs(logit, a):
+	""" Returns the observable utility of each line of the logit model for each
+	OD and each set of parameters given as arrays (points x OD x lines, see
+	Sweep.Arrays).
+	"""
+	wtt = a["wa"][:, None, None] * logit.access[None] + a["ww"][:, None, None] * logit.waiting[None] + \
+			a["wt"][:, None, None] * logit.invehicle[None] + a["we"][:, None, None] * logit.egress[None]
+	cost = a["ctime"][:, None, None] * wtt + logit.price[None, None, :] + a["alpha"][:, logit.mode][:, None, :]
+	car = np.where(logit.transit, 0.0, logit.trip_length[:, None])
+	return cost + a["car_price"][:, None, None] * car[None]
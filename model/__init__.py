@@ -1,8 +1,22 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+from BatchObjective import *
 from Corridor import *
+from Equilibrium import *
+from LazyResults import *
 from Line import *
+from LoadProfile import *
+from Logit import *
 from Model import *
+from MonteCarlo import *
 from OD import *
+from Objective import *
 from Parameters import *
+from Profiler import *
+from Progress import *
+from ResultCache import *
+from ScenarioStream import *
+from Storage import *
+from Summary import *
+from Sweep import *
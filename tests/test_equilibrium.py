@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_equilibrium.py
+
+""" Tests of the equilibrium between the demand, the modal split and the
+crowding of the vehicles (see Equilibrium).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+from test_objective import test_corridor
+
+
+class EquilibriumTest(unittest.TestCase):
+
+	def setUp(self):
+		self.param = m.Parameters()
+		self.param.crowding = [0, 0.5, 1, 1, 1, 1]
+		self.reference = test_corridor(self.param, [0, 1])
+		self.corridor = test_corridor(self.param, [0, 1, 3])
+		# Small vehicles : the lines are crowded
+		for line in self.corridor.lines[1:]:
+			line.k = 2.0
+
+	def test_fixed_point(self):
+		for reference in [None, self.reference]:
+			equilibrium = m.Equilibrium(self.param, self.corridor, reference)
+			logit = equilibrium.Solve()
+			self.assertTrue(logit.equilibrium["converged"])
+			self.assertLess(logit.equilibrium["iterations"], self.param.eq_iterations)
+			x = logit.LoadRatios().copy()
+			self.assertGreater(x.max(), 0.1)
+
+			# The load ratios of the crowded lines do not change any more
+			crowded = equilibrium.crowding != 0
+			residual = np.abs(equilibrium.Map(x) - x)[crowded].max()
+			self.assertLessEqual(residual, self.param.eq_tolerance)
+
+	def test_iterations(self):
+		self.param.eq_iterations = 3
+		for reference in [None, self.reference]:
+			logit = m.Equilibrium(self.param, self.corridor, reference).Solve()
+			self.assertEqual(logit.equilibrium["converged"], False)
+			self.assertEqual(logit.equilibrium["iterations"], self.param.eq_iterations)
+			self.assertEqual(len(logit.equilibrium["residuals"]), self.param.eq_iterations)
+			self.assertGreater(logit.equilibrium["residual"], self.param.eq_tolerance)
+
+	def test_without_crowding(self):
+		param = self.param.WithoutCrowding()
+		self.assertFalse(param.Crowded())
+		expected = m.Logit(self.corridor, param)
+		for logit in [self.corridor.GetLogit(param), m.Equilibrium(param, self.corridor).Solve()]:
+			np.testing.assert_array_equal(logit.cost, expected.cost)
+			np.testing.assert_array_equal(logit.split, expected.split)
+			np.testing.assert_array_equal(logit.gc, expected.gc)
+			np.testing.assert_array_equal(logit.LoadRatios(), expected.LoadRatios())
+		self.assertEqual(self.corridor.GetLogit(param).equilibrium, None)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_line.py
+
+""" Tests of the time tables of the lines (see Line.TimeTable).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+
+
+class TimeTableTest(unittest.TestCase):
+
+	def setUp(self):
+		self.param = m.Parameters()
+		self.corridor = m.Corridor("Test", 20, 2)
+		self.line = self.param.DefaultLine(self.corridor, 3)
+
+	def assertTable(self):
+		""" Checks the time table of the line against the commercial speed of each zone. """
+		corridor = self.corridor
+		zone_time = [corridor.zone_length[i]/self.line.GetCommercialSpeed(i) for i in range(corridor.n)]
+		np.testing.assert_allclose(self.line.ZoneTimes(), zone_time, rtol=1e-15)
+		np.testing.assert_allclose(self.line.TimeTable(), np.concatenate(([0], np.cumsum(zone_time))), rtol=1e-15)
+		od = corridor.GetOD(0, corridor.n - 1)
+		self.assertAlmostEqual(od.InVehicleTime(self.line),
+								zone_time[0]/2 + sum(zone_time[1:-1]) + zone_time[-1]/2, places=12)
+
+	def test_kept(self):
+		table = self.line.TimeTable()
+		self.assertTrue(self.line.TimeTable() is table)
+		self.line.f = 30
+		self.line.price = 2
+		self.assertTrue(self.line.TimeTable() is table)
+
+	def test_line_changes(self):
+		self.assertTable()
+		self.line.s[1] = 2.0
+		self.line.Touch()
+		self.assertTable()
+		self.line.v = [50, 70, 50]
+		self.assertTable()
+		self.line.dt = 60.0/3600
+		self.assertTable()
+		self.line.s = [0.2, 0.4, 0.3]
+		self.assertTable()
+
+	def test_zones_change(self):
+		self.assertTable()
+		self.corridor.SetLength(40)
+		self.assertTable()
+		self.corridor.SetZones([3.0, 12.0, 5.0])
+		self.assertTable()
+
+
+if __name__ == "__main__":
+	unittest.main()
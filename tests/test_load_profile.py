@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_load_profile.py
+
+""" Regression tests of the exact load profiles (see LoadProfile) against a
+dense sampling of the loads of the OD (OD.LoadA and OD.LoadB).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import random
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+
+# Number of samples in each zone
+SAMPLES = 2000
+
+def sampled_loads(corridor, direction):
+	""" Returns abscisses inside the zones (landmarks excluded, where OD.LoadA
+	and OD.LoadB are not continuous) and the sum of the loads of all OD.
+	"""
+	x = []
+	for k in range(corridor.n):
+		t = (np.arange(SAMPLES) + 0.5) / SAMPLES
+		x.extend(corridor.landmarks[k] + t * corridor.zone_length[k])
+	load = []
+	for xi in x:
+		if direction == "A":
+			load.append(sum([od.LoadA(corridor, xi) for od in corridor.demand]))
+		else:
+			load.append(sum([od.LoadB(corridor, xi) for od in corridor.demand]))
+	return np.array(x), np.array(load)
+
+def corridor_with_zones(zone_length, demand=None):
+	""" Returns a corridor with the given zones and demand (in the order of
+	Corridor.demand, all OD without demand by default).
+	"""
+	corridor = m.Corridor("Test", 10, 0)
+	corridor.SetZones(zone_length)
+	if demand != None:
+		corridor.SetDemand(demand)
+	return corridor
+
+
+class LoadProfileTest(unittest.TestCase):
+
+	def assertProfile(self, corridor, direction):
+		""" Checks the profile of the given direction against the sampled loads. """
+		if direction == "A":
+			profile = corridor.LoadProfileA()
+		else:
+			profile = corridor.LoadProfileB()
+		x, load = sampled_loads(corridor, direction)
+		scale = max(1.0, float(np.abs(load).max()))
+		np.testing.assert_allclose(profile.Load(x), load, rtol=0, atol=1e-9 * scale)
+
+		# The exact maximum is reached and is never lower than a sample
+		peak = profile.Max()
+		self.assertGreaterEqual(peak, max(0.0, load.max()) - 1e-9 * scale)
+		self.assertLess(peak - max(0.0, load.max()), 1e-3 * scale)
+		if peak > 0:
+			self.assertAlmostEqual(float(profile.Load(profile.ArgMax())), peak, delta=1e-9 * scale)
+		return profile
+
+	def test_random_demand(self):
+		random.seed(1)
+		for n in [1, 2, 3, 5]:
+			zone_length = [random.uniform(0.5, 6.0) for i in range(n)]
+			demand = [random.choice([0.0, random.uniform(0, 500)]) for i in range(n*n)]
+			corridor = corridor_with_zones(zone_length, demand)
+			self.assertProfile(corridor, "A")
+			self.assertProfile(corridor, "B")
+
+	def test_intra_zone(self):
+		# The load of an intra-zone OD is a parabola whose vertex (tl/2) is
+		# inside the first zone : its maximum is demand/4
+		corridor = corridor_with_zones([4.0, 2.0], [200, 0, 0, 0])
+		for direction in ["A", "B"]:
+			profile = self.assertProfile(corridor, direction)
+			self.assertAlmostEqual(profile.Max(), 50.0, places=9)
+			self.assertAlmostEqual(profile.ArgMax(), 0.5, places=9)
+
+		# Intra-zone trips of the second zone and trips between the zones
+		corridor = corridor_with_zones([4.0, 2.0], [10, 30, 20, 150])
+		self.assertProfile(corridor, "A")
+		self.assertProfile(corridor, "B")
+
+	def test_peak_at_landmark(self):
+		# Travelers from zone 0 to zone 1 are all on board at the limit of the
+		# zones, where the load is not differentiable
+		corridor = corridor_with_zones([3.0, 5.0], [0, 120, 0, 0])
+		profile = self.assertProfile(corridor, "B")
+		self.assertEqual(profile.Max(), 120.0)
+		self.assertEqual(profile.ArgMax(), 3.0)
+		self.assertEqual(corridor.LoadProfileA().Max(), 0.0)
+
+		# Plateau in the crossed zone : the maximum is reached on a whole zone
+		corridor = corridor_with_zones([2.0, 3.0, 1.0], [0, 0, 0, 0, 0, 0, 80, 0, 0])
+		profile = self.assertProfile(corridor, "A")
+		self.assertAlmostEqual(profile.Max(), 80.0, places=12)
+		self.assertTrue(2.0 <= profile.ArgMax() <= 5.0)
+
+	def test_unit_coefficients(self):
+		random.seed(2)
+		corridor = corridor_with_zones([1.0, 2.5, 0.7, 4.0])
+		demand = [random.uniform(0, 300) for i in range(corridor.n**2)]
+		corridor.SetDemand(demand)
+		landmarks = np.array(corridor.landmarks)
+		x = np.linspace(0, corridor.length, 97)
+		for direction, unit in zip(["A", "B"], corridor.UnitLoads()):
+			profile = m.LoadProfile(corridor, direction)
+
+			# The coefficients of the profile are the weighted sum of the unit ones
+			np.testing.assert_allclose(np.tensordot(demand, unit, axes=1), profile.coef,
+										rtol=1e-12, atol=1e-9)
+
+			# Load of one traveler of each OD
+			loads = m.unit_loads(unit, landmarks, x)
+			for od, load in zip(corridor.demand, loads):
+				one = corridor_with_zones(corridor.zone_length)
+				one.GetOD(od.origin, od.dest).demand = 1.0
+				np.testing.assert_allclose(load, m.LoadProfile(one, direction).Load(x), atol=1e-12)
+
+			# Maximum of several profiles at once
+			weights = np.array([demand, demand[::-1], np.zeros(len(demand))])
+			peak, abscisse = m.batched_peaks(landmarks, np.tensordot(weights, unit, axes=1))
+			for w, p, a in zip(weights, peak, abscisse):
+				profile = m.LoadProfile(corridor, direction, w)
+				self.assertAlmostEqual(p, profile.Max(), places=9)
+				if p > 0:
+					self.assertAlmostEqual(float(profile.Load(a)), p, places=9)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_objective.py
+
+""" Tests of the exact gradient of the objective function of an optimization
+(see Objective.ValueAndGradient) against central differences, and of the
+evaluation of many decision vectors at once (see BatchObjective).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import random
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+
+def test_corridor(param, modes, seed=0, zones=3, length=20.0):
+	""" Returns a corridor with zones of random lengths, random demand (intra
+	and inter-zones) and a default line of each mode of modes.
+	"""
+	random.seed(seed)
+	corridor = m.Corridor("Test", length, m.Corridor.CUSTOM)
+	weights = [random.uniform(0.5, 1.5) for i in range(zones)]
+	corridor.SetZones([length * w / sum(weights) for w in weights])
+	for od in corridor.demand:
+		od.demand = random.uniform(20, 400)
+	for i, mode in enumerate(modes):
+		line = param.DefaultLine(corridor, mode)
+		line.price = 1.5 if mode != 0 else 0
+		line.name = "Line %d" % i
+		corridor.lines.append(line)
+	return corridor
+
+def central_differences(objective, x, step=1e-6):
+	""" Returns the gradient of the objective at x by central differences. """
+	grad = np.zeros(len(x))
+	for c in range(len(x)):
+		h = step * max(1.0, abs(x[c]))
+		xp = np.array(x, dtype=float)
+		xm = np.array(x, dtype=float)
+		xp[c] += h
+		xm[c] -= h
+		grad[c] = (objective.Value(xp) - objective.Value(xm)) / (2 * h)
+	return grad
+
+
+class ObjectiveTest(unittest.TestCase):
+
+	def setUp(self):
+		self.param = m.Parameters()
+		# Costs of the stations are 0 by default
+		self.param.csta = [0, 5, 10, 20, 50, 80]
+
+	def objective(self, modes, optimized, opt, elasticity, capacity=None):
+		""" Returns the objective of the optimization of the last optimized
+		lines of a corridor with lines of the given modes (opt gives the
+		optimized variables of each of them, see Line.opt, and capacity the
+		capacity of their vehicles).
+		"""
+		# The reference has the same zones and OD as the corridor
+		reference = test_corridor(self.param, [0, 1])
+		corridor = test_corridor(self.param, modes)
+		lines = corridor.lines[-optimized:]
+		corridor.lines = corridor.lines[:-optimized]
+		for line in lines:
+			line.opt = opt
+			if capacity != None:
+				line.k = capacity
+		return m.Objective(self.param, reference, corridor, lines, elasticity)
+
+	def points(self, objective, number=3):
+		""" Returns starting points of the objective (its initial decision
+		vector and random points inside the bounds, away from the stop spacing
+		equal to the length of a zone, where the objective is not
+		differentiable).
+		"""
+		points = []
+		for x in objective.StartingPoints(number, seed=3):
+			for c, (i, j) in enumerate(objective.variables):
+				if j >= 0:
+					x[c] = min(x[c], 0.9 * objective.corridor.zone_length[j])
+			points.append(x)
+		return points
+
+
+class ObjectiveGradientTest(ObjectiveTest):
+
+	def assertGradient(self, objective, x, malus=False):
+		""" Checks the exact gradient at x against central differences (malus
+		tells whether a line is over its capacity at x, None if it does not
+		matter).
+		"""
+		value, grad = objective.ValueAndGradient(x)
+		self.assertAlmostEqual(value, objective.Value(x), places=9)
+		if malus != None:
+			logit = objective.Bind(x).GetLogit(objective.param)
+			self.assertEqual(bool((logit.LineMaxLoads() > logit.capacity).any()), malus)
+
+		expected = central_differences(objective, x)
+		scale = max(1.0, np.abs(expected).max())
+		np.testing.assert_allclose(grad, expected, rtol=0, atol=1e-6 * scale)
+
+	def test_inelastic(self):
+		for modes in ([0, 1, 3], [0, 2, 4, 5]):
+			objective = self.objective(modes, 2, [1, [1, 1, 1]], False)
+			for x in self.points(objective):
+				self.assertGradient(objective, x)
+
+	def test_elastic(self):
+		for modes in ([0, 1, 3], [0, 2, 4, 5]):
+			objective = self.objective(modes, 2, [1, [1, 1, 1]], True)
+			for x in self.points(objective):
+				self.assertGradient(objective, x)
+
+	def test_frequency_only(self):
+		for elasticity in (False, True):
+			objective = self.objective([0, 1, 3], 2, [1, [0, 0, 0]], elasticity)
+			for x in self.points(objective):
+				self.assertGradient(objective, x)
+
+	def test_stop_spacing_only(self):
+		for elasticity in (False, True):
+			objective = self.objective([0, 1, 3], 1, [0, [1, 0, 1]], elasticity)
+			for x in self.points(objective):
+				self.assertGradient(objective, x)
+
+	def test_car(self):
+		# The frequency and the stop spacing of a car line do not change the
+		# travel times, the frequency changes its capacity
+		for elasticity in (False, True):
+			objective = self.objective([1, 0], 1, [1, [1, 1, 1]], elasticity)
+			for x in self.points(objective):
+				self.assertGradient(objective, x, None)
+
+	def test_malus(self):
+		for elasticity in (False, True):
+			objective = self.objective([0, 1, 2], 2, [1, [1, 1, 1]], elasticity, capacity=0.5)
+			# Transit is barely used at most of the random points
+			x0 = np.array(objective.Variables()[0])
+			for x in [x0, 0.9 * x0, 1.1 * x0]:
+				self.assertGradient(objective, x, malus=True)
+
+
+class BatchObjectiveTest(ObjectiveTest):
+
+	def assertBatch(self, objective, X):
+		""" Checks the values and gradients of the rows of X evaluated at once
+		against ValueAndGradient.
+		"""
+		values, grads = objective.ValuesAndGradients(X)
+		self.assertEqual(grads.shape, (len(X), len(objective.variables)))
+		for x, value, grad in zip(X, values, grads):
+			expected, expected_grad = objective.ValueAndGradient(x)
+			self.assertAlmostEqual(value, expected, delta=1e-12 * max(1.0, abs(expected)))
+			np.testing.assert_allclose(grad, expected_grad, rtol=1e-10, atol=1e-10)
+
+	def test_batch(self):
+		for elasticity in (False, True):
+			for modes in ([0, 1, 3], [0, 2, 4, 5]):
+				objective = self.objective(modes, 2, [1, [1, 1, 1]], elasticity)
+				self.assertBatch(objective, np.array(self.points(objective, 5)))
+
+	def test_malus(self):
+		for elasticity in (False, True):
+			objective = self.objective([0, 1, 2], 2, [1, [1, 1, 1]], elasticity, capacity=0.5)
+			x0 = np.array(objective.Variables()[0])
+			X = np.array([x0, 0.9 * x0, 1.1 * x0])
+			for x in X:
+				logit = objective.Bind(x).GetLogit(objective.param)
+				self.assertTrue((logit.LineMaxLoads() > logit.capacity).any())
+			self.assertBatch(objective, X)
+
+	def test_chunks(self):
+		# Batch evaluated in several chunks of 2 decision vectors
+		for elasticity in (False, True):
+			objective = self.objective([0, 1, 3], 2, [1, [1, 1, 1]], elasticity)
+			objective.batch = m.BatchObjective(objective)
+			cells = len(objective.batch.logit.demand) * len(objective.batch.f)
+			objective.batch.chunk = 2 * cells
+			X = np.array(self.points(objective, 6))
+			self.assertBatch(objective, X)
+			values = objective.ValuesAndGradients(X, False)[0]
+			objective.batch.chunk = len(X) * cells
+			np.testing.assert_array_equal(objective.ValuesAndGradients(X, False)[0], values)
+
+
+if __name__ == "__main__":
+	unittest.main()
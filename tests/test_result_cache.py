@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_result_cache.py
+
+""" Tests of the result files of the cache of the scenarios (see ResultCache).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+from test_objective import test_corridor
+
+
+class ResultCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.param = m.Parameters()
+		self.result = test_corridor(self.param, [0, 1])
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_next_session(self):
+		m.ResultCache(path=self.directory).Set("key", self.result)
+		# Only the result file is left in the directory
+		self.assertEqual(os.listdir(self.directory), ["key.pkl"])
+
+		cache = m.ResultCache(path=self.directory)
+		result = cache.Get("key")
+		self.assertEqual(len(result.lines), len(self.result.lines))
+		self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+	def test_truncated_file(self):
+		m.ResultCache(path=self.directory).Set("key", self.result)
+		path = os.path.join(self.directory, "key.pkl")
+		f = open(path, "rb")
+		data = f.read()
+		f.close()
+		for content in [data[:len(data) // 2], "", "not a pickle"]:
+			f = open(path, "wb")
+			f.write(content)
+			f.close()
+			cache = m.ResultCache(path=self.directory)
+			self.assertEqual(cache.Get("key"), None)
+			self.assertEqual((cache.hits, cache.misses), (0, 1))
+			self.assertFalse(os.path.exists(path))
+
+	def test_model(self):
+		# A truncated result file is computed again
+		model = m.Model()
+		model.cache = m.ResultCache(path=self.directory)
+		model.reference = test_corridor(model.param, [0, 1])
+		model.simulations.append([test_corridor(model.param, [0, 1, 3]), True])
+		model.Calculate()
+		[name] = os.listdir(self.directory)
+		f = open(os.path.join(self.directory, name), "r+b")
+		f.truncate(10)
+		f.close()
+
+		model.cache = m.ResultCache(path=self.directory)
+		model.Calculate()
+		self.assertEqual(model.cache.misses, 1)
+		self.assertEqual(len(model.simulations_results), 1)
+		self.assertEqual(os.listdir(self.directory), [name])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_storage.py
+
+""" Tests of the study archives and of the results files (see Storage).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+from test_objective import test_corridor
+
+
+class StorageTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.model = m.Model()
+		self.model.reference = test_corridor(self.model.param, [0, 1])
+		self.model.simulations.append([test_corridor(self.model.param, [0, 1, 3]), True])
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+	def test_save_without_results(self):
+		# A study which has never been computed
+		m.save_study(self.model, self.path("study.zip"))
+		m.save_results(self.model, self.path("results.json"))
+		model = m.Model()
+		m.load_study(self.path("study.zip"), model)
+		self.assertEqual(len(model.simulations), 1)
+		self.assertEqual(model.results_success, [])
+		self.assertEqual(sorted(os.listdir(self.directory)), ["results.json", "study.zip"])
+
+	def test_failed_save_keeps_file(self):
+		self.model.Calculate()
+		m.save_study(self.model, self.path("study.zip"))
+		f = open(self.path("study.zip"), "rb")
+		content = f.read()
+		f.close()
+
+		# The summaries can not be written
+		self.model.summaries = [None]
+		self.assertRaises(AttributeError, m.save_study, self.model, self.path("study.zip"))
+		f = open(self.path("study.zip"), "rb")
+		self.assertTrue(f.read() == content)
+		f.close()
+		self.assertEqual(os.listdir(self.directory), ["study.zip"])
+
+	def test_save_over_loaded_study(self):
+		# The results of the loaded study are read from the file while it is
+		# written again
+		self.model.Calculate()
+		m.save_study(self.model, self.path("study.zip"))
+		model = m.Model()
+		m.load_study(self.path("study.zip"), model)
+		m.save_study(model, self.path("study.zip"))
+
+		loaded = m.Model()
+		m.load_study(self.path("study.zip"), loaded)
+		result = loaded.simulations_results[0]
+		expected = self.model.simulations_results[0]
+		self.assertEqual(list(result.od.Flat("demand")), list(expected.od.Flat("demand")))
+		self.assertEqual(len(result.lines), len(expected.lines))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test_sweep.py
+
+""" Tests of the parameters accepted by the sweeps of simulation scenarios
+(see Sweep and MonteCarlo).
+
+	python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model as m
+from test_objective import test_corridor
+
+# Parameters which change the lines or the equilibrium, not the sweep
+NOT_SWEPT = ["vmax[1]", "s[1]", "f[1]", "k[1]", "dt[1]", "price[1]", "crowding[1]",
+			"eq_tolerance", "eq_iterations", "price"]
+
+
+class SweepTest(unittest.TestCase):
+
+	def setUp(self):
+		self.param = m.Parameters()
+		self.reference = test_corridor(self.param, [0, 1])
+		self.sim = [test_corridor(self.param, [0, 1, 3]), True]
+
+	def test_swept_parameters(self):
+		sweep = m.Sweep(self.param, self.reference, self.sim)
+		for key in ["ctime", "wa", "ww", "wt", "we", "alpha[1]", "car_price", "cexp[1]",
+					"cinf[3]", "csta[1]", "gamma", "captive", "demand", "demand[2]"]:
+			rows = sweep.Evaluate([{key: 0.5}, {key: 2.0}])
+			self.assertNotEqual(rows[0]["total_surplus"], rows[1]["total_surplus"], key)
+
+	def test_not_swept_parameters(self):
+		sweep = m.Sweep(self.param, self.reference, self.sim)
+		for key in NOT_SWEPT + ["unknown", "ctime[1"]:
+			self.assertRaises(ValueError, sweep.Evaluate, [{key: 0.5}, {key: 50}])
+			self.assertRaises(ValueError, sweep.Arrays, [{"ctime": 10}, {key: 50}])
+
+	def test_monte_carlo(self):
+		m.MonteCarlo(self.param, self.reference, self.sim, {"ctime": ("normal", 12, 2)})
+		for key in NOT_SWEPT:
+			self.assertRaises(ValueError, m.MonteCarlo, self.param, self.reference, self.sim,
+								{key: ("normal", 1, 0.1)})
+
+
+if __name__ == "__main__":
+	unittest.main()
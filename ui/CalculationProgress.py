@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# CalculationProgress.py
+
+import threading
+import wx
+import model
+
+class CalculationProgress(model.Progress):
+	""" Displays the progression of Model.Calculate in a progress dialog.
+	
+	Model.Calculate runs in a background thread (see SimulationPanel.OnCalculate) :
+	the dialog is only used from the main thread (with wx.CallAfter) and the
+	buttons of the dialog cancel the whole computation ("Annuler") or the
+	scenario being optimized ("Passer").
+	The summary of each scenario is displayed in the results as soon as it is
+	computed.
+	"""
+	
+	def __init__(self, main_window=None):
+		self.main_window = main_window
+		self.progress_dialog = None
+		self.abort = threading.Event()
+		self.skipped = set()
+		self.current = None # Scenario being optimized
+	
+	def Start(self, total):
+		wx.CallAfter(self.Open)
+	
+	def Update(self, count, total, name=""):
+		self.current = None
+		wx.CallAfter(self.Refresh, 100*count/total, "Scénario calculé : " + name)
+	
+	def Iteration(self, name, iteration, value):
+		self.current = name
+		wx.CallAfter(self.Refresh, None, "Optimisation de " + name + 
+					" : itération " + str(iteration) + ", coût " + str(round(value, 0)))
+	
+	def Result(self, summary):
+		if self.main_window != None:
+			wx.CallAfter(self.main_window.AppendResult, summary)
+	
+	def Cancelled(self, name=None):
+		if name == None:
+			return self.abort.is_set()
+		return name in self.skipped
+	
+	def Finish(self):
+		wx.CallAfter(self.Close)
+	
+	def Open(self):
+		""" Creates the progress dialog (main thread). """
+		self.progress_dialog = wx.ProgressDialog("Simulation et optimisation", 
+												"Calculs en cours", 
+												style=wx.PD_APP_MODAL|wx.PD_AUTO_HIDE|wx.PD_ELAPSED_TIME|
+														wx.PD_CAN_ABORT|wx.PD_CAN_SKIP)
+		self.progress_dialog.Update(0)
+	
+	def Refresh(self, value, message):
+		""" Updates the progress dialog (main thread) and reads its buttons.
+		value is a percentage, or None to keep the former one.
+		"""
+		if self.progress_dialog == None:
+			return
+		if value == None:
+			value = self.progress_dialog.GetValue()
+		r = self.progress_dialog.Update(min(value, 99), message)
+		if not isinstance(r, tuple):
+			r = (r, False)
+		if not r[0]:
+			self.abort.set()
+		elif r[1] and self.current != None:
+			self.skipped.add(self.current)
+	
+	def Close(self):
+		""" Destroys the progress dialog (main thread). """
+		if self.progress_dialog != None:
+			self.progress_dialog.Destroy()
+			self.progress_dialog = None
@@ -5,6 +5,7 @@
 
 import wx
 import wx.grid
+import model
 from LineDialog import *
 
 class CorridorPanel(wx.Panel):
@@ -120,10 +121,10 @@ class CorridorPanel(wx.Panel):
 		self.demand.CreateGrid(self.model.reference.n, self.model.reference.n)
 		
 		# OD matrix
-		alphabet = ["A", "B", "C", "D", "E"]
 		total_demand = 0
 		for i in range(self.model.reference.n):
-			self.demand.SetRowLabelValue(i, alphabet[i])
+			self.demand.SetRowLabelValue(i, model.zone_name(i))
+			self.demand.SetColLabelValue(i, model.zone_name(i))
 			for j in range(self.model.reference.n):
 				d = self.model.reference.GetOD(i, j).demand
 				total_demand += d
@@ -152,7 +153,11 @@ class CorridorPanel(wx.Panel):
 		"""
 		typology_sizer = wx.BoxSizer(wx.HORIZONTAL)
 			
-		self.typology_image = wx.StaticBitmap(self, 1, wx.Bitmap("ui/images/"+str(self.model.reference.typo)+".png"))
+		if self.model.reference.typo == model.Corridor.CUSTOM:
+			# Zones given by the study (see Corridor.SetZones)
+			self.typology_image = wx.StaticText(self, label=str(self.model.reference.n)+" zones")
+		else:
+			self.typology_image = wx.StaticBitmap(self, 1, wx.Bitmap("ui/images/"+str(self.model.reference.typo)+".png"))
 		next_button = wx.Button(self, 1, ">", size=(20,30))
 		next_button.Bind(wx.EVT_BUTTON, self.OnNext)
 		prev_button = wx.Button(self, 1, "<", size=(20,30))
@@ -75,10 +75,9 @@ class CreateLineDialog(wx.Dialog):
 		
 		# Vehicle speed
 		self.max_speed = []
-		abc = ["A", "B", "C", "D", "E", "F", "G"]
 		for i in range(self.corridor.n):
 			max_speed_sizer = wx.BoxSizer(wx.HORIZONTAL)
-			max_speed_label = wx.StaticText(self, label="Vitesse inter-station (km/h) zone "+abc[i]+" :")
+			max_speed_label = wx.StaticText(self, label="Vitesse inter-station (km/h) zone "+model.zone_name(i)+" :")
 			self.max_speed.append(wx.SpinCtrl(self, value=str(self.default_line.v[i]), size=(60,-1), max=220))
 			max_speed_sizer.Add(max_speed_label, 1, wx.ALIGN_CENTER_VERTICAL)
 			max_speed_sizer.Add(self.max_speed[-1], 1, wx.ALIGN_CENTER_VERTICAL)
@@ -104,7 +103,7 @@ class CreateLineDialog(wx.Dialog):
 		self.interstation = []
 		for i in range(self.corridor.n):
 			interstation_sizer = wx.BoxSizer(wx.HORIZONTAL)
-			interstation_label = wx.StaticText(self, label="Distance inter-station (km) zone "+abc[i]+" :")
+			interstation_label = wx.StaticText(self, label="Distance inter-station (km) zone "+model.zone_name(i)+" :")
 			self.interstation.append(wx.TextCtrl(self, value=str(self.default_line.s[i]), size=(60,-1)))
 	   		interstation_sizer.Add(interstation_label, 1, wx.ALIGN_CENTER_VERTICAL)
 			interstation_sizer.Add(self.interstation[-1], 1, wx.ALIGN_CENTER_VERTICAL)
@@ -250,11 +249,10 @@ class OptOptionsDialog(wx.Dialog):
 		
 		# Vehicle speed
 		self.max_speed = []
-		abc = ["A", "B", "C", "D", "E", "F", "G"]
 		for i in range(self.corridor.n):
 			max_speed_sizer = wx.BoxSizer(wx.HORIZONTAL)
 			self.max_speed.append(wx.SpinCtrl(self, value=str(self.default_line.v[i]), size=(60,-1), max=220, min=10))
-			max_speed_sizer.Add(wx.StaticText(self, label="Vitesse inter-station (km/h) en zone "+abc[i]+" :"), 1, wx.ALIGN_CENTER_VERTICAL)
+			max_speed_sizer.Add(wx.StaticText(self, label="Vitesse inter-station (km/h) en zone "+model.zone_name(i)+" :"), 1, wx.ALIGN_CENTER_VERTICAL)
 			max_speed_sizer.Add(self.max_speed[-1], 0, wx.ALIGN_CENTER_VERTICAL)
 			vehicle_sizer.Add(max_speed_sizer)
 			
@@ -283,7 +281,7 @@ class OptOptionsDialog(wx.Dialog):
 		self.interstation_max = []
 		self.interstation_opt = []
 		for i in range(self.corridor.n):
-			self.interstation_opt.append(wx.CheckBox(self, label="Distance inter-station (km) zone "+abc[i]+" :"))
+			self.interstation_opt.append(wx.CheckBox(self, label="Distance inter-station (km) zone "+model.zone_name(i)+" :"))
 			self.interstation_opt[-1].SetValue(self.default_line.opt[1][i])
 			self.interstation.append(wx.TextCtrl(self, value=str(self.default_line.s[i]), size=(60,-1)))
 			self.interstation_min.append(wx.TextCtrl(self, value=str(self.default_line.cons[1][i][0]), size=(60,-1)))
@@ -3,7 +3,9 @@
 
 # LogitDialog.py
 
+import threading
 import wx
+import model
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
 from wx.lib.mixins.listctrl import ColumnSorterMixin
 
@@ -21,10 +23,17 @@ class LogitDialog(wx.Dialog):
 	Create a new dialog that enables user to modify the parameters of the logit model.
 	"""
 	
+	# Delay (ms) between the last change of a field and the computation of the preview
+	PREVIEW_DELAY = 300
+	
 	def __init__(self, parent, param, corridor):
 		super(LogitDialog, self).__init__(parent)
 		self.param = param
 		self.corridor = corridor
+		self.generation = 0 # Number of the last preview asked (see Preview)
+		self.closed = False
+		self.timer = wx.Timer(self)
+		self.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
 		self.SetSize((480,480))
 		self.InitUI()
 		self.SetTitle("Paramètres du modèle de choix modal")
@@ -64,30 +73,65 @@ class LogitDialog(wx.Dialog):
 		
 		sizer.Add(self.test, 1, wx.EXPAND)
 		
-		self.OnChange(None)
+		self.OnTimer(None)
 		
 		self.SetSizer(sizer)
 		self.Layout()
 		
 	def OnChange(self, e):
+		""" The preview is computed when no field has changed for PREVIEW_DELAY ms. """
+		self.timer.Start(LogitDialog.PREVIEW_DELAY, wx.TIMER_ONE_SHOT)
+	
+	def OnTimer(self, e):
+		""" Computes the preview with the mode constants of the fields in a
+		background thread.
+		"""
 		p = self.param.Duplicate()
+		try:
+			for i in range(p.nb_modes):
+				p.alpha[i] = float(self.alpha[i].GetValue())
+		except ValueError:
+			return
 		
-		for i in range(p.nb_modes):
-			p.alpha[i] = float(self.alpha[i].GetValue())
-		
+		self.generation += 1
+		thread = threading.Thread(target=self.Preview, args=(p, self.generation))
+		thread.daemon = True
+		thread.start()
+	
+	def Preview(self, p, generation):
+		""" Computes the demand and the load ratio of each line with parameters
+		p (background thread) from a single logit model.
+		"""
+		logit = model.Logit(self.corridor, p)
+		line_demand = logit.LineDemand()
+		load_ratio = logit.LoadRatios()
+		if generation == self.generation:
+			wx.CallAfter(self.ShowPreview, line_demand, load_ratio, generation)
+	
+	def ShowPreview(self, line_demand, load_ratio, generation):
+		""" Displays the preview computed by Preview, unless a more recent one
+		has been asked.
+		"""
+		if self.closed or generation != self.generation:
+			return
+		total_demand = self.corridor.TotalDemand()
 		self.test.DeleteAllItems()
-		for line in self.corridor.lines:
+		for j, line in enumerate(self.corridor.lines):
+			split = line_demand[j]/total_demand if total_demand != 0 else 0.0
+			load = load_ratio[j]
 			index = self.test.InsertStringItem(1000, line.name)
-			self.test.SetStringItem(index, 1, str(int(round(self.corridor.Demand(p, line)))))
-			self.test.SetStringItem(index, 2, str(int(round(100.0*self.corridor.Demand(p, line)/self.corridor.TotalDemand())))+" %")
-			self.test.SetStringItem(index, 3, str(int(round(self.corridor.Demand(p, line)/self.corridor.TotalDemand()*100.0*max(self.corridor.MaxLoadA(), self.corridor.MaxLoadB())/(line.f*line.k))))+" %")
+			self.test.SetStringItem(index, 1, str(int(round(line_demand[j]))))
+			self.test.SetStringItem(index, 2, str(int(round(100.0*split)))+" %")
+			self.test.SetStringItem(index, 3, str(int(round(100.0*load)))+" %")
 			
 	   		
 	def OnOK(self, event):
 		for i in range(self.param.nb_modes):
 			self.param.alpha[i] = float(self.alpha[i].GetValue())
 		
-		self.Destroy()
+		self.OnClose(event)
 	
 	def OnClose(self, event):
+		self.closed = True
+		self.timer.Stop()
 		self.Destroy()
@@ -12,6 +12,8 @@ from SimulationPanel import *
 from LogitDialog import *
 from SuccessDialog import *
 
+STUDY_WILDCARD = "Études (*.study)|*.study|Tous les fichiers|*"
+
 class MainWindow(wx.Frame):
 	""" This class initializes the initial configuration and creates the main 
 	structure of the user interface (menus and pages).
@@ -46,6 +48,11 @@ class MainWindow(wx.Frame):
 		
 		# File Menu
 		fileMenu = wx.Menu()
+		open_study = fileMenu.Append(wx.ID_OPEN, 'Ouvrir une étude...', 'Ouvrir une étude')
+		self.Bind(wx.EVT_MENU, self.OnOpen, open_study)
+		save_study = fileMenu.Append(wx.ID_SAVE, 'Enregistrer l\'étude...', 'Enregistrer l\'étude et ses résultats')
+		self.Bind(wx.EVT_MENU, self.OnSave, save_study)
+		fileMenu.AppendSeparator()
 		quit = fileMenu.Append(wx.ID_EXIT, 'Quittter', 'Quitter')
 		self.Bind(wx.EVT_MENU, self.OnQuit, quit)
 		
@@ -76,6 +83,29 @@ class MainWindow(wx.Frame):
 	def OnQuit(self, e):
 		self.Close()
 		
+	def OnOpen(self, e):
+		""" Loads a study file (see model.load_study) and displays it. """
+		dialog = wx.FileDialog(self, "Ouvrir une étude", wildcard=STUDY_WILDCARD, style=wx.FD_OPEN)
+		if dialog.ShowModal() == wx.ID_OK:
+			model.load_study(dialog.GetPath(), self.model)
+			self.corridor_panel.DestroyChildren()
+			self.corridor_panel.InitUI()
+			self.simulation_panel.UpdateUI()
+			self.results_panel.param = self.model.param
+			self.results_panel.corridor = self.model.reference
+			self.results_panel.DeleteResults()
+			if self.model.summaries:
+				self.results_panel.InsertResults()
+		dialog.Destroy()
+	
+	def OnSave(self, e):
+		""" Saves the study and its results in a study archive (see model.save_study). """
+		dialog = wx.FileDialog(self, "Enregistrer l'étude", wildcard=STUDY_WILDCARD, 
+								style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
+		if dialog.ShowModal() == wx.ID_OK:
+			model.save_study(self.model, dialog.GetPath())
+		dialog.Destroy()
+		
 	def OnModify(self, e):
 		""" Open a dialog to modify the parameters of the model. """
 		p = ParametersDialog(None, self.model.param)
@@ -91,13 +121,22 @@ class MainWindow(wx.Frame):
 		p.ShowModal()
 		p.Destroy()
 	
+	# The following methods are called by Model.Calculate, which runs in a
+	# background thread : they are executed in the main thread.
+	
 	def DeleteResults(self):
-		self.results_panel.DeleteResults()
+		wx.CallAfter(self.results_panel.DeleteResults)
 		
 	def InsertResults(self):
-		self.results_panel.InsertResults()
+		wx.CallAfter(self.results_panel.InsertResults)
+	
+	def AppendResult(self, summary):
+		self.results_panel.AppendResult(summary)
 		
 	def SuccessDialog(self, results_success):
+		wx.CallAfter(self.ShowSuccessDialog, results_success)
+	
+	def ShowSuccessDialog(self, results_success):
 		p = SuccessDialog(results_success)
 		p.ShowModal()
 		p.Destroy()
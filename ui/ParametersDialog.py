@@ -22,7 +22,7 @@ class ParametersDialog(wx.Dialog):
 		sizer = wx.BoxSizer(wx.HORIZONTAL)
 		
 		# Travelers parameters
-		travelers_fgs = wx.FlexGridSizer(13, 2)
+		travelers_fgs = wx.FlexGridSizer(7 + 2*self.param.nb_modes, 2)
 		
 		ctime_label = wx.StaticText(self, label="Valeur du temps (€/h) :")
 		wa_label = wx.StaticText(self, label="Pondération temps d'accès :")
@@ -63,6 +63,13 @@ class ParametersDialog(wx.Dialog):
 			self.dt.append(wx.TextCtrl(self, value=str(self.param.dt[i]*3600)))
 			travelers_fgs.AddMany([(dt_labels[-1]), (self.dt[-1], 1, wx.EXPAND)])
 		
+		crowding_labels = []
+		self.crowding = []
+		for i in range(self.param.nb_modes):
+			crowding_labels.append(wx.StaticText(self, label="Pénibilité de la charge du mode "+self.param.mode_name[i]+" :"))
+			self.crowding.append(wx.TextCtrl(self, value=str(self.param.crowding[i])))
+			travelers_fgs.AddMany([(crowding_labels[-1]), (self.crowding[-1], 1, wx.EXPAND)])
+		
 		sizer.Add(travelers_fgs, 0, wx.ALL|wx.EXPAND, 20)
 		
 		# Operators parameters
@@ -119,6 +126,7 @@ class ParametersDialog(wx.Dialog):
 		
 		for i in range(self.param.nb_modes):
 			self.param.dt[i] = float(self.dt[i].GetValue())/3600
+			self.param.crowding[i] = float(self.crowding[i].GetValue())
 			self.param.csta[i] = float(self.csta[i].GetValue())
 			self.param.cexp[i] = float(self.cexp[i].GetValue())
 			self.param.cinf[i] = float(self.cinf[i].GetValue())
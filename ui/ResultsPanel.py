@@ -7,6 +7,7 @@ import wx
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
 from wx.lib.mixins.listctrl import ColumnSorterMixin
 import math
+import model
 
 class AutoWidthSortListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin, ColumnSorterMixin):
 	def __init__(self, parent):
@@ -88,42 +89,33 @@ class ResultsPanel(wx.Panel):
 		self.Layout()
 		
 	def OnSelect(self, e):
-		all_sce = [self.corridor]
-		for r in self.model.simulations_results:
-			all_sce.append(r)
-		for r in self.model.optimizations_results:
-			all_sce.append(r)
+		summaries = self.model.summaries
+		if not summaries:
+			return
 		
-		sce = [all_sce[self.cb1.GetSelection()], all_sce[self.cb2.GetSelection()]]
+		sce = [summaries[self.cb1.GetSelection()], summaries[self.cb2.GetSelection()]]
 		
 		for i in range(len(self.supply)):
 			self.supply[i].DeleteAllItems()
 			for line in sce[i].lines:
-				demand = str_results(sce[i].Demand(self.param, line), 0)
-				if sce[i].TotalDemand() != 0:
-					split = str_results(100.0*sce[i].Demand(self.param, line)/sce[i].TotalDemand(), 0)
-				else:
-					split = "0"
-				if sce[i].TotalDemand() != 0 and line.f != 0 and line.k != 0:
-					max_load = str_results(sce[i].Demand(self.param, line)/sce[i].TotalDemand()*100.0*max(sce[i].MaxLoadA(), sce[i].MaxLoadB())/(line.f*line.k), 0)
-				else:
-					max_load = "0"
-				f = str_results(line.f,1)
-				vc = str_results(line.GetCommercialSpeed(), 0)
+				demand = str_results(line["demand"], 0)
+				split = str_results(100.0*line["split"], 0)
+				max_load = str_results(100.0*line["load_ratio"], 0)
+				f = str_results(line["f"],1)
+				vc = str_results(line["commercial_speed"], 0)
 				
 				s = ""
-				abc = ["A", "B", "C", "D", "E"]
 				for j in range(self.corridor.n):
-					s_str = str_results(line.s[j]*1000, 0)
-					s += abc[j] + " : "+s_str+" m "
+					s_str = str_results(line["s"][j]*1000, 0)
+					s += model.zone_name(j) + " : "+s_str+" m "
 						
-				n_veh = str_results(line.VehiclesNumber(), 0)
-				infra_cost = str_results(line.InfraCost(self.param), 0)
-				op_cost = str_results(line.OperatingCost(self.param), 0)
-				total_cost = str_results(line.InfraCost(self.param)+line.OperatingCost(self.param), 0)
-				revenues = str_results(sce[i].Revenues(self.param, line), 0)
+				n_veh = str_results(line["vehicles"], 0)
+				infra_cost = str_results(line["infra_cost"], 0)
+				op_cost = str_results(line["operating_cost"], 0)
+				total_cost = str_results(line["operator_cost"], 0)
+				revenues = str_results(line["revenues"], 0)
 				
-				index = self.supply[i].InsertStringItem(1000, line.name)
+				index = self.supply[i].InsertStringItem(1000, line["name"])
 				self.supply[i].SetStringItem(index, 1, demand)
 				self.supply[i].SetStringItem(index, 2, split+" %")
 				self.supply[i].SetStringItem(index, 3, max_load+" %")
@@ -148,46 +140,43 @@ class ResultsPanel(wx.Panel):
 		
 		self.cb1.Clear()
 		self.cb2.Clear()
-		self.cb1.Append(self.corridor.name)
-		self.cb2.Append(self.corridor.name)
-		for r in self.model.simulations_results:
-			self.cb1.Append(r.name)
-			self.cb2.Append(r.name)
-		for r in self.model.optimizations_results:
+		for r in self.model.summaries:
 			self.cb1.Append(r.name)
 			self.cb2.Append(r.name)
 		
 		self.cb1.SetSelection(0)
 		self.OnSelect(None)
 		
-		# Creating a list of the results to be displayed
-		results = [self.model.reference]
-		for result in self.model.simulations_results:
-			results.append(result)
-		for result in self.model.optimizations_results:
-			results.append(result)
-		
-		for r in results:
-			index = self.list.InsertStringItem(1000, r.name)
-			
-			total_demand = str_results(r.TotalDemand(), 0)
-			travel_time = str_results(r.AvgTravelTime(self.param)*60, 0)
-			if r.TotalDemand() != 0:
-				gen_cost_u = str_results(r.GeneralizedCost(self.param)/r.TotalDemand(),2)
-			else:
-				gen_cost_u = "0"
-			infra_cost = str_results(r.InfraCost(self.param), 0)
-			op_cost = str_results(r.OperatingCost(self.param), 0)
-			total_cost = str_results(r.TotalCost(self.param), 0)
-			total_surplus = str_results(self.model.reference.TotalSurplus(self.param, r), 0)
-			
-			self.list.SetStringItem(index, 1, total_demand)
-			self.list.SetStringItem(index, 2, travel_time+" min")
-			self.list.SetStringItem(index, 3, gen_cost_u+" €")
-			self.list.SetStringItem(index, 4, infra_cost+" €/h")
-			self.list.SetStringItem(index, 5, op_cost+" €/h")
-			self.list.SetStringItem(index, 6, total_cost+" €/h")
-			self.list.SetStringItem(index, 7, total_surplus+" €/h")
+		# The results are read from the summaries computed by the model (the
+		# results displayed during the computation are replaced)
+		self.list.DeleteAllItems()
+		for r in self.model.summaries:
+			self.AppendResult(r)
+	
+	def AppendResult(self, r):
+		""" Display the costs of a scenario given as a Summary (called as soon
+		as a scenario is computed, see CalculationProgress).
+		"""
+		index = self.list.InsertStringItem(1000, r.name)
+		
+		total_demand = str_results(r.total_demand, 0)
+		travel_time = str_results(r.avg_travel_time*60, 0)
+		if r.total_demand != 0:
+			gen_cost_u = str_results(r.AvgGeneralizedCost(), 2)
+		else:
+			gen_cost_u = "0"
+		infra_cost = str_results(r.infra_cost, 0)
+		op_cost = str_results(r.operating_cost, 0)
+		total_cost = str_results(r.total_cost, 0)
+		total_surplus = str_results(r.total_surplus, 0)
+		
+		self.list.SetStringItem(index, 1, total_demand)
+		self.list.SetStringItem(index, 2, travel_time+" min")
+		self.list.SetStringItem(index, 3, gen_cost_u+" €")
+		self.list.SetStringItem(index, 4, infra_cost+" €/h")
+		self.list.SetStringItem(index, 5, op_cost+" €/h")
+		self.list.SetStringItem(index, 6, total_cost+" €/h")
+		self.list.SetStringItem(index, 7, total_surplus+" €/h")
 	
 def str_results(value, decimals):
 	if value == float("inf"):
@@ -3,8 +3,10 @@
 
 # SimulationPanel.py
 
+import threading
 import wx
 from ScenarioDialog import *
+from CalculationProgress import *
 from model import Model
 
 class SimulationPanel(wx.Panel):
@@ -28,9 +30,9 @@ class SimulationPanel(wx.Panel):
 		sizer.Add(self.simulation_sizer(), 0, wx.ALL|wx.EXPAND, 20)
 		sizer.Add(self.optimization_sizer(), 0, wx.ALL|wx.EXPAND, 20)			
 		calculate_sizer = wx.BoxSizer(wx.HORIZONTAL)
-		calculate_button = wx.Button(self, label="Calculer")
-		calculate_button.Bind(wx.EVT_BUTTON, self.OnCalculate)
-		calculate_sizer.Add(calculate_button)
+		self.calculate_button = wx.Button(self, label="Calculer")
+		self.calculate_button.Bind(wx.EVT_BUTTON, self.OnCalculate)
+		calculate_sizer.Add(self.calculate_button)
 		sizer.Add(calculate_sizer, 0, wx.ALL, 20)
 		
 		self.SetSizer(sizer)
@@ -51,7 +53,21 @@ class SimulationPanel(wx.Panel):
 		self.Layout()
 		
 	def OnCalculate(self, e):
-		self.model.Calculate()
+		""" Computes the model in a background thread so that the interface
+		stays responsive (see CalculationProgress).
+		"""
+		self.calculate_button.Disable()
+		progress = CalculationProgress(self.model.main_window)
+		thread = threading.Thread(target=self.Calculate, args=(progress,))
+		thread.daemon = True
+		thread.start()
+	
+	def Calculate(self, progress):
+		""" Computes the model (background thread). """
+		try:
+			self.model.Calculate(progress)
+		finally:
+			wx.CallAfter(self.calculate_button.Enable)
 	   	
 	def CreateSimScenario(self, e):
 		""" Create a simulation scenario creation dialog. """
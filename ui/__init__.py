@@ -9,3 +9,4 @@ from ParametersDialog import *
 from ScenarioDialog import *
 from SimulationPanel import *
 from LogitDialog import *
+from CalculationProgress import *